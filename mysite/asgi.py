@@ -14,3 +14,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
 
 application = get_asgi_application()
+
+# Move langdetect's lazy profile loading off the first localization save.
+# With a preforking server that loads the app before forking (e.g. gunicorn
+# --preload), workers inherit the loaded profiles.
+from polls.language import preload_profiles  # noqa: E402
+
+preload_profiles()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.gis',
+    'django.contrib.postgres',
     'polls',
     'import_export',
 ]
@@ -129,7 +131,61 @@ STATIC_URL = '/static/'
 # Directory where Django will collect all static files
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Uploaded files, such as queued location CSV imports
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Load langdetect's language profiles when a server process starts (see mysite/wsgi.py)
+LANGDETECT_PRELOAD = True
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'polls': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
+# Cache for API response bodies and vector tiles. The local-memory backend is
+# per process; set DJANGO_CACHE_BACKEND=file to share one cache between workers.
+# Response cache generations are kept in the database (polls.CacheGeneration),
+# so invalidation reaches every process with either backend.
+if os.environ.get('DJANGO_CACHE_BACKEND') == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('DJANGO_CACHE_DIR', BASE_DIR / 'cache'),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'polls',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+    }
+
+# Cache alias and lifetime (seconds) of cached list responses, see polls/caching.py
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Public site URL used for absolute links in XML sitemaps (generate_sitemap --xml)
+SITEMAP_BASE_URL = os.environ.get('SITEMAP_BASE_URL', 'http://localhost:8000')
+
+# Seconds a rendered vector tile stays in the cache
+TILE_CACHE_TIMEOUT = 3600
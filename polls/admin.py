@@ -1,27 +1,60 @@
 from django.contrib import admin
 from import_export.admin import ImportExportModelAdmin
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
 from django.urls import path, reverse
 from django import forms
-from django.shortcuts import render
-from django.contrib.gis.geos import Point
-from django.core.exceptions import ValidationError
-from langdetect import detect, LangDetectException
-import csv
-from .models import Location, Accommodation, LocalizeAccommodation
+from django.shortcuts import get_object_or_404, render
+from django.contrib.postgres.search import SearchQuery
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+from .models import Location, Accommodation, LocalizeAccommodation, LocationImportJob
+from .importers import import_locations, read_location_csv
+from .language import validate_localization
+from .search import DEFAULT_SEARCH_CONFIG, autocomplete, search_query, title_match
+
+
+# Maximum number of per-row error messages shown after a synchronous import
+IMPORT_ERROR_MESSAGES = 20
+
+
+def is_autocomplete(request):
+    """
+    Whether the request comes from the admin's autocomplete widget view.
+    """
+    return getattr(request.resolver_match, 'url_name', None) == 'autocomplete'
 
 
 class CSVUploadForm(forms.Form):
-    csv_file = forms.FileField(label="CSV File", help_text="Upload a CSV file containing location data.")
+    csv_file = forms.FileField(
+        label="CSV File",
+        help_text="Upload a CSV file containing location data. An optional parent_id column links each location to its parent."
+    )
+    run_in_background = forms.BooleanField(
+        required=False,
+        help_text="Queue the file for the `run_location_imports` worker instead of importing it now."
+    )
 
 
 @admin.register(Location)
 class LocationAdmin(admin.ModelAdmin):
     list_display = ('id', 'title', 'location_type', 'country_code', 'city', 'created_at', 'updated_at')
-    search_fields = ('title', 'location_type', 'country_code', 'city')
+    search_fields = ('title', 'city')
     list_filter = ('location_type', 'country_code')
     change_list_template = "admin/location_changelist.html"
 
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Match title and city through their trigram indexes instead of scanning every search field.
+
+        Type and country are covered by the list filters.
+        """
+        term = search_term.strip()
+        if is_autocomplete(request):
+            return autocomplete(queryset, term), False
+        if not term:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(title_match('title', term) | title_match('city', term)), False
+
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
@@ -41,43 +74,34 @@ class LocationAdmin(admin.ModelAdmin):
             form = CSVUploadForm(request.POST, request.FILES)
             if form.is_valid():
                 csv_file = form.cleaned_data['csv_file']
-                decoded_file = csv_file.read().decode('utf-8').splitlines()
-                reader = csv.DictReader(decoded_file)
-
-                skipped_rows = 0
-                total_rows = 0
-
-                for row in reader:
-                    total_rows += 1
-                    try:
-                        # Parse the center field into a Point
-                        center_coordinates = row['center'].replace("POINT(", "").replace(")", "").split()
-                        if len(center_coordinates) != 2:
-                            raise ValidationError("Invalid POINT format.")
-
-                        center = Point(float(center_coordinates[0]), float(center_coordinates[1]))
-
-                        # Create or update Location object
-                        Location.objects.update_or_create(
-                            id=row['id'],
-                            defaults={
-                                'title': row['title'],
-                                'center': center,
-                                'location_type': row['location_type'],
-                                'country_code': row['country_code'],
-                                'state_abbr': row['state_abbr'],
-                                'city': row['city'],
-                            }
-                        )
-                    except Exception as e:
-                        skipped_rows += 1
-                        self.message_user(request, f"Error on row {total_rows}: {e}", level="error")
+
+                if form.cleaned_data['run_in_background']:
+                    job = LocationImportJob.objects.create(csv_file=csv_file, created_by=request.user)
+                    self.message_user(request, f"Import job #{job.pk} queued.", level="success")
+                    return HttpResponseRedirect(reverse('admin:polls_locationimportjob_changelist'))
+
+                result = import_locations(read_location_csv(csv_file))
+                errors = sorted(result.errors)
+                for row_number, error in errors[:IMPORT_ERROR_MESSAGES]:
+                    self.message_user(request, f"Error on row {row_number}: {error}", level="error")
+                if len(errors) > IMPORT_ERROR_MESSAGES:
+                    self.message_user(
+                        request,
+                        f"{len(errors) - IMPORT_ERROR_MESSAGES} more rows had errors.",
+                        level="error"
+                    )
 
                 self.message_user(
                     request,
-                    f"CSV import complete. {total_rows - skipped_rows} rows imported, {skipped_rows} rows skipped.",
+                    f"CSV import complete. {result.imported_rows} rows imported, {result.skipped_rows} rows skipped.",
                     level="success"
                 )
+                if result.unresolved_parents:
+                    self.message_user(
+                        request,
+                        f"{result.unresolved_parents} parent links could not be resolved.",
+                        level="warning"
+                    )
                 return HttpResponseRedirect(reverse('admin:polls_location_changelist'))
 
                 # return HttpResponseRedirect("../")
@@ -87,6 +111,46 @@ class LocationAdmin(admin.ModelAdmin):
         return render(request, "admin/csv_form.html", {"form": form})
 
 
+@admin.register(LocationImportJob)
+class LocationImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'csv_file', 'status', 'processed_rows', 'skipped_rows', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = (
+        'csv_file', 'status', 'created_by', 'processed_rows', 'skipped_rows', 'errors', 'message',
+        'created_at', 'updated_at', 'started_at', 'finished_at'
+    )
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path('<int:job_id>/status/', self.admin_site.admin_view(self.job_status), name='polls_locationimportjob_status'),
+        ]
+        return custom_urls + urls
+
+    def job_status(self, request, job_id):
+        """
+        Return the progress of an import job as JSON, for polling.
+        """
+        job = get_object_or_404(LocationImportJob, pk=job_id)
+        if not self.has_view_permission(request, job):
+            raise PermissionDenied
+        return JsonResponse({
+            "id": job.pk,
+            "status": job.status,
+            "processed_rows": job.processed_rows,
+            "imported_rows": job.imported_rows,
+            "skipped_rows": job.skipped_rows,
+            "errors": job.errors,
+            "message": job.message,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        })
+
+    def has_add_permission(self, request):
+        # Jobs are created from the Location CSV import form
+        return False
+
+
 @admin.register(Accommodation)
 class AccommodationAdmin(admin.ModelAdmin):
     list_display = ('id', 'title', 'feed', 'country_code', 'bedroom_count', 'review_score', 'usd_rate', 'published', 'created_at', 'updated_at')
@@ -103,6 +167,21 @@ class AccommodationAdmin(admin.ModelAdmin):
             return qs
         return qs.filter(user_id=request.user)
 
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Match titles through the indexed search vector instead of a LIKE scan.
+
+        Autocomplete lookups type partial words, so they match title substrings
+        through the trigram index and return a single short page.
+        """
+        term = search_term.strip()
+        if is_autocomplete(request):
+            return autocomplete(queryset, term), False
+        if not term:
+            return super().get_search_results(request, queryset, search_term)
+        query = SearchQuery(term, search_type='websearch', config=DEFAULT_SEARCH_CONFIG)
+        return queryset.filter(Q(search_vector=query) | Q(country_code__iexact=term)), False
+
     def save_model(self, request, obj, form, change):
         """
         Automatically associate the logged-in user as the owner of the accommodation
@@ -148,6 +227,20 @@ class LocalizeAccommodationAdmin(admin.ModelAdmin):
             return qs
         return qs.filter(property_id__user_id=request.user)
 
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Match descriptions and accommodation titles through their indexed search vectors.
+        """
+        term = search_term.strip()
+        if not term:
+            return super().get_search_results(request, queryset, search_term)
+        title_query = SearchQuery(term, search_type='websearch', config=DEFAULT_SEARCH_CONFIG)
+        return queryset.filter(
+            Q(search_vector=search_query(term))
+            | Q(property_id__search_vector=title_query)
+            | Q(language__iexact=term)
+        ), False
+
     def description_short(self, obj):
         """
         Shorten the description to display in the admin list.
@@ -160,23 +253,8 @@ class LocalizeAccommodationAdmin(admin.ModelAdmin):
         Validate that the description and policy fields match the selected language.
         Restrict adding/editing localizations to only the owner of the property.
         """
-        # Language validation for description
-        try:
-            detected_lang = detect(obj.description)
-            if detected_lang != obj.language:
-                raise ValidationError(f"The description must be written in {obj.language.upper()}.")
-        except LangDetectException:
-            raise ValidationError("Language detection failed. Please ensure the description is valid.")
-
-        # Language validation for policy
-        if isinstance(obj.policy, dict):
-            for key, value in obj.policy.items():
-                try:
-                    detected_lang = detect(value)
-                    if detected_lang != obj.language:
-                        raise ValidationError(f"The policy field '{key}' must be written in {obj.language.upper()}.")
-                except LangDetectException:
-                    raise ValidationError(f"Language detection failed for policy field '{key}'.")
+        # Language validation for description and policy (memoized on the instance)
+        validate_localization(obj)
 
         if not request.user.is_superuser and obj.property_id.user_id != request.user:
             raise PermissionError("You can only manage localizations for your own properties.")
@@ -0,0 +1,181 @@
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.utils.timezone import now
+from django.views.decorators.http import condition
+from .models import CacheGeneration
+
+
+def format_token(token, started_at):
+    """
+    Combine a generation's token with its start time, as used in cache keys and validators.
+    """
+    return f"{started_at.timestamp():.6f}:{token}"
+
+
+def token_time(token):
+    return datetime.fromtimestamp(float(token.partition(':')[0]), tz=timezone.utc)
+
+
+def response_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def location_generations(*location_ids):
+    """
+    Generations touched by a change to locations: the location list and the
+    children pages of the given locations.
+    """
+    return ['locations'] + [f'location:{location_id}' for location_id in location_ids if location_id]
+
+
+def accommodation_generations(*country_codes):
+    """
+    Generations touched by a change to accommodations in the given countries.
+    """
+    return ['accommodations'] + [f'accommodations:{country_code}' for country_code in country_codes if country_code]
+
+
+def current_generations(names):
+    """
+    Return the current token of each generation, creating missing ones.
+
+    Generations live in the database (CacheGeneration), so a bump made by any
+    process, including management commands, is seen by every web worker.
+    The cache backend only holds the response bodies, keyed by these tokens.
+    """
+    def read(names):
+        rows = CacheGeneration.objects.filter(name__in=names).values_list('name', 'token', 'started_at')
+        return {name: format_token(token, started_at) for name, token, started_at in rows}
+
+    tokens = read(names)
+    missing = [name for name in names if name not in tokens]
+    if missing:
+        started_at = now()
+        CacheGeneration.objects.bulk_create(
+            [CacheGeneration(name=name, token=uuid.uuid4().hex, started_at=started_at) for name in missing],
+            ignore_conflicts=True,
+        )
+        # Re-read, in case another process created some of them first
+        tokens.update(read(missing))
+    return [tokens[name] for name in names]
+
+
+def bump_generations(names):
+    """
+    Start a new generation for each name once the current transaction commits,
+    so no response can be cached from data that is about to change.
+
+    The upsert runs in its own short statement after the commit, so writers
+    do not hold locks on the shared generation rows while their transaction runs.
+    """
+    names = sorted(set(names))  # A fixed order keeps concurrent upserts from deadlocking
+    if not names:
+        return
+
+    def bump():
+        table = connection.ops.quote_name(CacheGeneration._meta.db_table)
+        started_at = now()
+        values = ', '.join(['(%s, %s, %s)'] * len(names))
+        params = [value for name in names for value in (name, uuid.uuid4().hex, started_at)]
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO {table} (name, token, started_at) VALUES {values}
+                ON CONFLICT (name) DO UPDATE SET token = EXCLUDED.token, started_at = EXCLUDED.started_at
+            """, params)
+
+    transaction.on_commit(bump)
+
+
+def response_digest(view_name, params, args, generations):
+    """
+    Hash the view, its URL arguments, the query parameters with keys and
+    values sorted, and the generation tokens it depends on.
+
+    Every query parameter is hashed, so no filter (see filters.FILTER_PARAMS)
+    can be left out of the key.
+    """
+    normalized = sorted((key, sorted(values)) for key, values in params.lists())
+    raw = repr((view_name, args, normalized, generations))
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def response_key(view_name, params, args, generations):
+    return f"response:{view_name}:{response_digest(view_name, params, args, generations)}"
+
+
+def request_generations(request, generations, args, kwargs):
+    """
+    Read a view's generation tokens once per request, so the ETag and
+    Last-Modified validators share a single query.
+    """
+    names = tuple(generations(request, *args, **kwargs))
+    memo = request.__dict__.setdefault('_generation_tokens', {})
+    if names not in memo:
+        memo[names] = current_generations(names)
+    return memo[names]
+
+
+def conditional_response(generations):
+    """
+    Answer If-None-Match / If-Modified-Since with 304 Not Modified from the
+    generation tokens alone, before the view runs a query or serializes a row.
+
+    The ETag changes whenever the query parameters or one of the generations
+    change. Both validators come from the shared generation rows, so a
+    change made by any process invalidates them.
+
+    Last-Modified has one-second granularity, so it is the start of the
+    newest generation rounded up to the next second, and it is only sent once
+    that second has begun. A client can then only hold a Last-Modified
+    from before a later bump, and If-Modified-Since cannot hide that bump.
+    """
+    def etag(request, *args, **kwargs):
+        tokens = request_generations(request, generations, args, kwargs)
+        return response_digest(request.path, request.GET, (), tokens)
+
+    def last_modified(request, *args, **kwargs):
+        tokens = request_generations(request, generations, args, kwargs)
+        started_at = max(token_time(token) for token in tokens)
+        modified = started_at.replace(microsecond=0) + timedelta(seconds=1)
+        # Within the bump's own second, rely on the ETag alone
+        return modified if modified <= now() else None
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def cache_response(generations):
+    """
+    Cache successful GET responses of a JSON view until one of its generations is bumped.
+
+    `generations(request, **kwargs)` returns the generation names the response
+    depends on. Cached responses carry `X-Cache: HIT`.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            cache = response_cache()
+            # Read the tokens before running the view: a bump while it runs
+            # leaves the result under the old, never-read key
+            tokens = request_generations(request, generations, args, kwargs)
+            key = response_key(view.__name__, request.GET, (args, sorted(kwargs.items())), tokens)
+            content = cache.get(key)
+            if content is not None:
+                response = HttpResponse(content, content_type='application/json')
+                response['X-Cache'] = 'HIT'
+                return response
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(key, response.content, getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
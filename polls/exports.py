@@ -0,0 +1,66 @@
+import csv
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_CHUNK_SIZE = 2000
+
+# Accommodation columns included in an export, in output order
+EXPORT_FIELDS = [
+    'id', 'feed', 'title', 'country_code', 'location_id', 'bedroom_count', 'review_score',
+    'usd_rate', 'center', 'images', 'amenities', 'published', 'created_at', 'updated_at',
+]
+
+# Columns written as JSON text in CSV exports
+CSV_JSON_FIELDS = ('images', 'amenities')
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class Echo:
+    """
+    A file-like object whose write() returns the value instead of storing it,
+    so csv.writer can produce one line at a time.
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_rows(accommodations, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield export dicts from a queryset through a server-side cursor,
+    holding at most `chunk_size` rows in memory.
+    """
+    for row in accommodations.values(*EXPORT_FIELDS).iterator(chunk_size=chunk_size):
+        center = row.pop('center')
+        row['center'] = [center.x, center.y] if center is not None else None
+        yield row
+
+
+def ndjson_lines(rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        for field in CSV_JSON_FIELDS:
+            row[field] = json.dumps(row[field], cls=DjangoJSONEncoder)
+        center = row['center']
+        row['center'] = f"POINT({center[0]} {center[1]})" if center else ''
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+
+
+def export_lines(accommodations, export_format):
+    """
+    Return a generator of NDJSON or CSV lines for the accommodations.
+    """
+    rows = export_rows(accommodations)
+    return ndjson_lines(rows) if export_format == 'ndjson' else csv_lines(rows)
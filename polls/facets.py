@@ -0,0 +1,113 @@
+from django.db import connection, transaction
+from django.db.models import Sum
+from .models import Accommodation, AccommodationFacet
+
+# Bedroom counts are bucketed as 0, 1, 2, 3, 4 and 5+
+BEDROOM_BUCKETS = ['0', '1', '2', '3', '4', '5+']
+
+# Upper bounds (exclusive) of the usd_rate price bands; the last band is open-ended
+PRICE_BAND_LIMITS = [50, 100, 200, 500]
+PRICE_BANDS = ['<50', '50-100', '100-200', '200-500', '500+']
+
+
+def bedroom_bucket(bedroom_count):
+    return min(bedroom_count, len(BEDROOM_BUCKETS) - 1)
+
+
+def price_band(usd_rate):
+    for band, limit in enumerate(PRICE_BAND_LIMITS):
+        if usd_rate < limit:
+            return band
+    return len(PRICE_BAND_LIMITS)
+
+
+def facet_key(accommodation):
+    """
+    Return the (country_code, published, bedroom_bucket, price_band) row an accommodation counts towards.
+
+    Values are normalised as the fields store them, since unsaved instances
+    may still hold strings such as usd_rate='99.50' or published='0'.
+    """
+    def value(name):
+        return Accommodation._meta.get_field(name).to_python(getattr(accommodation, name))
+
+    return (
+        accommodation.country_code,
+        value('published'),
+        bedroom_bucket(value('bedroom_count')),
+        price_band(value('usd_rate')),
+    )
+
+
+def bump_facets(deltas):
+    """
+    Add {facet key: delta} to the facet counts with one INSERT ... ON CONFLICT statement.
+    """
+    deltas = [(key, delta) for key, delta in deltas.items() if delta]
+    if not deltas:
+        return
+    table = connection.ops.quote_name(AccommodationFacet._meta.db_table)
+    values = ', '.join(['(%s, %s, %s, %s, %s)'] * len(deltas))
+    params = [value for key, delta in deltas for value in (*key, delta)]
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO {table} AS facet (country_code, published, bedroom_bucket, price_band, count)
+            VALUES {values}
+            ON CONFLICT (country_code, published, bedroom_bucket, price_band)
+            DO UPDATE SET count = facet.count + EXCLUDED.count
+        """, params)
+
+
+def facet_key_sql(alias):
+    """
+    Return the SELECT list computing facet_key() for the accommodation rows aliased `alias`.
+    """
+    band_cases = ' '.join(
+        f'WHEN {alias}.usd_rate < {limit} THEN {band}' for band, limit in enumerate(PRICE_BAND_LIMITS)
+    )
+    return (
+        f"{alias}.country_code, {alias}.published, "
+        f"LEAST({alias}.bedroom_count, {len(BEDROOM_BUCKETS) - 1}) AS bedroom_bucket, "
+        f"CASE {band_cases} ELSE {len(PRICE_BAND_LIMITS)} END AS price_band"
+    )
+
+
+def rebuild_facets():
+    """
+    Recompute every facet count from the Accommodation table in one grouped query.
+
+    Runs in a transaction, so readers keep seeing the previous counts until it commits.
+    """
+    facet_table = connection.ops.quote_name(AccommodationFacet._meta.db_table)
+    accommodation_table = connection.ops.quote_name(Accommodation._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {facet_table}")
+        cursor.execute(f"""
+            INSERT INTO {facet_table} (country_code, published, bedroom_bucket, price_band, count)
+            SELECT {facet_key_sql('a')}, count(*)
+            FROM {accommodation_table} a
+            GROUP BY 1, 2, 3, 4
+        """)
+
+
+def facet_counts(published=None, country_code=None):
+    """
+    Return the counts per country, bedroom bucket and price band.
+
+    Country counts ignore the country filter so the other countries stay
+    selectable; the bedroom and price counts honour both filters.
+    """
+    facets = AccommodationFacet.objects.filter(count__gt=0)
+    if published is not None:
+        facets = facets.filter(published=published)
+    countries = facets.values('country_code').annotate(total=Sum('count')).order_by('country_code')
+    if country_code:
+        facets = facets.filter(country_code=country_code)
+    bedrooms = facets.values('bedroom_bucket').annotate(total=Sum('count')).order_by('bedroom_bucket')
+    prices = facets.values('price_band').annotate(total=Sum('count')).order_by('price_band')
+
+    return {
+        "countries": [{"country_code": row['country_code'], "count": row['total']} for row in countries],
+        "bedrooms": [{"bucket": BEDROOM_BUCKETS[row['bedroom_bucket']], "count": row['total']} for row in bedrooms],
+        "price_bands": [{"band": PRICE_BANDS[row['price_band']], "count": row['total']} for row in prices],
+    }
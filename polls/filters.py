@@ -0,0 +1,78 @@
+from decimal import Decimal, InvalidOperation
+
+# Range filters: query parameter -> ORM lookup
+RANGE_FILTERS = {
+    'min_bedrooms': ('bedroom_count__gte', int),
+    'max_bedrooms': ('bedroom_count__lte', int),
+    'min_price': ('usd_rate__gte', Decimal),
+    'max_price': ('usd_rate__lte', Decimal),
+    'min_score': ('review_score__gte', Decimal),
+    'max_score': ('review_score__lte', Decimal),
+}
+
+# Every query parameter read by filter_accommodations; views that cache
+# filtered results build their keys from this
+FILTER_PARAMS = ('published', 'country', 'location', *RANGE_FILTERS)
+
+# `sort` values -> ordering; each ends with the primary key so keyset pagination works,
+# in the same direction so a (field, id) index can be scanned either way
+ACCOMMODATION_SORTS = {
+    'id': ['id'],
+    'price': ['usd_rate', 'id'],
+    '-price': ['-usd_rate', '-id'],
+    'score': ['review_score', 'id'],
+    '-score': ['-review_score', '-id'],
+    'bedrooms': ['bedroom_count', 'id'],
+    '-bedrooms': ['-bedroom_count', '-id'],
+}
+
+
+def filter_accommodations(accommodations, params):
+    """
+    Apply the accommodation list filters found in `params` (e.g. request.GET).
+
+    Query parameters:
+    - `published`: Filter by published status, 0 or 1 (optional)
+    - `country`: Filter by country code (optional)
+    - `location`: Filter by location id (optional)
+    - `min_bedrooms`, `max_bedrooms`: Bedroom count range (optional)
+    - `min_price`, `max_price`: `usd_rate` range (optional)
+    - `min_score`, `max_score`: Review score range (optional)
+
+    Raises ValueError for malformed values.
+    """
+    published = params.get('published', None)
+    country_code = params.get('country', None)
+    location_id = params.get('location', None)
+
+    if published is not None:
+        accommodations = accommodations.filter(published=bool(int(published)))
+
+    if country_code:
+        accommodations = accommodations.filter(country_code=country_code)
+
+    if location_id:
+        accommodations = accommodations.filter(location_id=location_id)
+
+    for name, (lookup, convert) in RANGE_FILTERS.items():
+        value = params.get(name, None)
+        if value is None or value == '':
+            continue
+        try:
+            accommodations = accommodations.filter(**{lookup: convert(value)})
+        except (ValueError, InvalidOperation):
+            raise ValueError(f"`{name}` must be a number.")
+
+    return accommodations
+
+
+def accommodation_ordering(params):
+    """
+    Return the ordering for the `sort` query parameter (default by id).
+
+    Raises ValueError for unknown sort options.
+    """
+    sort = params.get('sort', None) or 'id'
+    if sort not in ACCOMMODATION_SORTS:
+        raise ValueError(f"`sort` must be one of: {', '.join(ACCOMMODATION_SORTS)}.")
+    return ACCOMMODATION_SORTS[sort]
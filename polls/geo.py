@@ -0,0 +1,68 @@
+import math
+from django.contrib.gis.geos import Point, Polygon
+from django.db.models import Q
+
+# Shortest length of one degree of latitude on the WGS84 spheroid (at the
+# equator), in meters, so conversions to degrees never fall short
+METERS_PER_DEGREE = 110574
+
+
+def parse_lat_lon(params):
+    """
+    Read `lat` and `lon` from `params` into a WGS84 Point.
+
+    Raises ValueError if either is missing or out of range.
+    """
+    try:
+        lat = float(params['lat'])
+        lon = float(params['lon'])
+    except (KeyError, TypeError):
+        raise ValueError("Both `lat` and `lon` are required.")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("`lat` must be within [-90, 90] and `lon` within [-180, 180].")
+    return Point(lon, lat, srid=4326)
+
+
+def meters_to_degrees(meters, latitude):
+    """
+    Convert a distance to a number of degrees that covers it in every direction
+    around `latitude`, for index-friendly bounding box prefilters.
+
+    Errs on the large side, so an exact distance filter can follow it.
+    """
+    degrees = meters / METERS_PER_DEGREE
+    # Longitude degrees shrink towards the poles, most at the circle's poleward edge
+    scale = math.cos(math.radians(min(abs(latitude) + degrees, 90)))
+    if scale < 0.01:
+        # The circle reaches (nearly) a pole, where any longitude may be in range
+        return 540
+    return degrees / scale
+
+
+def dwithin_wrapped(field, point, degrees):
+    """
+    Return a Q matching `field` within `degrees` of `point`, including across
+    the antimeridian, where planar degrees jump from 180 to -180.
+    """
+    condition = Q(**{f"{field}__dwithin": (point, degrees)})
+    for shift in (-360, 360):
+        if abs(point.x + shift) - degrees < 180:
+            condition |= Q(**{f"{field}__dwithin": (Point(point.x + shift, point.y, srid=point.srid), degrees)})
+    return condition
+
+
+def parse_bbox(value):
+    """
+    Parse a "west,south,east,north" string in WGS84 degrees into a Polygon.
+
+    Raises ValueError if it is malformed.
+    """
+    try:
+        west, south, east, north = (float(part) for part in value.split(','))
+    except ValueError:
+        raise ValueError("`bbox` must be four comma-separated numbers: west,south,east,north.")
+    if not (west < east and south < north):
+        raise ValueError("`bbox` must have west < east and south < north.")
+    bbox = Polygon.from_bbox((west, south, east, north))
+    bbox.srid = 4326
+    return bbox
@@ -0,0 +1,52 @@
+from django.db import connection
+from .models import Location
+
+
+def rebuild_location_paths(updated_since=None):
+    """
+    Recompute `path` and `depth` with one recursive query.
+
+    With `updated_since`, only the subtrees under locations saved at or after
+    that time are recomputed, starting from the stored paths of their nearest
+    untouched ancestors; otherwise every Location is. Only rows whose values
+    change are written. Returns the number of rows updated. Locations caught
+    in a parent cycle are unreachable from a root and keep their current values.
+    """
+    table = connection.ops.quote_name(Location._meta.db_table)
+    parent_column = connection.ops.quote_name(Location._meta.get_field('parent_id').column)
+    if updated_since is None:
+        roots = f"SELECT id, '/' || id || '/', 0 FROM {table} WHERE {parent_column} IS NULL"
+        params = []
+    else:
+        # `affected` uses UNION, so it stops on parent cycles. Its roots hang
+        # off a root or an unaffected parent that already has a path.
+        roots = f"""
+            SELECT location.id, COALESCE(parent.path, '/') || location.id || '/', COALESCE(parent.depth + 1, 0)
+            FROM {table} AS location
+            LEFT JOIN {table} AS parent ON parent.id = location.{parent_column}
+            WHERE location.id IN (SELECT id FROM affected)
+                AND (location.{parent_column} IS NULL
+                     OR (parent.path <> '' AND parent.id NOT IN (SELECT id FROM affected)))
+        """
+        params = [updated_since]
+    affected = f"""
+        affected (id) AS (
+            SELECT id FROM {table} WHERE updated_at >= %s
+            UNION
+            SELECT child.id FROM {table} AS child JOIN affected ON child.{parent_column} = affected.id
+        ),
+    """ if updated_since is not None else ''
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            WITH RECURSIVE {affected} tree (id, path, depth) AS (
+                {roots}
+                UNION ALL
+                SELECT child.id, tree.path || child.id || '/', tree.depth + 1
+                FROM {table} AS child JOIN tree ON child.{parent_column} = tree.id
+            )
+            UPDATE {table} AS location SET path = tree.path, depth = tree.depth
+            FROM tree
+            WHERE location.id = tree.id
+                AND (location.path, location.depth) IS DISTINCT FROM (tree.path, tree.depth)
+        """, params)
+        return cursor.rowcount
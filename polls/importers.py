@@ -0,0 +1,459 @@
+import codecs
+import csv
+from contextlib import contextmanager, nullcontext
+from datetime import timedelta
+from django.contrib.gis.geos import Point
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, connection, models, transaction
+from django.utils import timezone
+from .caching import bump_generations, location_generations
+from .hierarchy import rebuild_location_paths
+from .models import Location, LocationImportJob
+from .slugs import choose_slug, slug_candidates
+
+# Number of rows sent to the database in a single INSERT ... ON CONFLICT statement
+LOCATION_IMPORT_BATCH_SIZE = 1000
+
+# Columns refreshed when a row with the same id already exists
+LOCATION_UPSERT_FIELDS = ['title', 'center', 'location_type', 'country_code', 'state_abbr', 'city', 'slug', 'updated_at']
+
+# Number of ids per query when resolving parents after an import
+PARENT_LOOKUP_BATCH_SIZE = 10000
+
+# Maximum number of row errors kept on a background import job
+IMPORT_JOB_ERROR_SAMPLE = 50
+
+
+class LocationImportResult:
+    """
+    Counters and per-row errors collected while importing locations.
+    """
+
+    def __init__(self, max_errors=None):
+        self.total_rows = 0
+        self.skipped_rows = 0
+        self.errors = []
+        self.max_errors = max_errors
+        self.unresolved_parents = 0
+
+    @property
+    def imported_rows(self):
+        return self.total_rows - self.skipped_rows
+
+    def add_error(self, row_number, error):
+        self.skipped_rows += 1
+        if self.max_errors is None or len(self.errors) < self.max_errors:
+            self.errors.append((row_number, str(error)))
+
+    def add_parent_error(self, row_number, error):
+        # The row itself was imported; only its parent link was not applied
+        self.unresolved_parents += 1
+        if self.max_errors is None or len(self.errors) < self.max_errors:
+            self.errors.append((row_number, str(error)))
+
+
+def iter_csv_lines(chunks, encoding='utf-8'):
+    """
+    Decode an iterable of byte chunks incrementally and yield text lines.
+
+    Line endings are kept so csv.reader can handle quoted newlines, and only
+    one chunk plus one partial line is held in memory at a time.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        start = 0
+        end = pending.find('\n')
+        while end != -1:
+            yield pending[start:end + 1]
+            start = end + 1
+            end = pending.find('\n', start)
+        pending = pending[start:]
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def read_location_csv(uploaded_file, encoding='utf-8'):
+    """
+    Lazily parse an uploaded CSV file into row dicts without reading it whole.
+    """
+    return csv.DictReader(iter_csv_lines(uploaded_file.chunks(), encoding))
+
+
+def parse_point(value):
+    """
+    Parse a WKT string such as "POINT(90.4125 23.8103)" into a Point.
+    """
+    coordinates = value.replace("POINT(", "").replace(")", "").split()
+    if len(coordinates) != 2:
+        raise ValidationError("Invalid POINT format.")
+    return Point(float(coordinates[0]), float(coordinates[1]))
+
+
+def build_location(row):
+    """
+    Build an unsaved Location from a CSV row, validating its fields.
+    """
+    location = Location(
+        id=row['id'],
+        title=row['title'],
+        center=parse_point(row['center']),
+        location_type=row['location_type'],
+        country_code=row['country_code'],
+        state_abbr=row['state_abbr'],
+        city=row['city'],
+    )
+    # Catch length/blank errors here instead of failing the whole batch in the database
+    location.clean_fields(exclude=['parent_id'])
+    return location
+
+
+def assign_slugs(batch, result):
+    """
+    Give every location in a {id: (row_number, location)} batch a slug that is
+    unique within its country, with one query for the slugs already in use.
+
+    Rows for which no candidate slug is free are removed from the batch and
+    reported on `result`.
+    """
+    candidates = {location_id: slug_candidates(location.title, location_id) for location_id, (_, location) in batch.items()}
+    owners = {}  # (country, slug) -> id of the location holding it
+    current = {}
+    existing = Location.objects.filter(
+        country_code__in={location.country_code for _, location in batch.values()},
+        slug__in={slug for slugs in candidates.values() for slug in slugs},
+    ).values_list('id', 'country_code', 'slug')
+    for location_id, country_code, slug in existing:
+        owners[(country_code, slug)] = location_id
+        current[location_id] = (country_code, slug)
+
+    # Rows moving away from a slug free it for the rest of the batch
+    for location_id, (_, location) in batch.items():
+        if location_id in current:
+            owners.pop(current[location_id], None)
+
+    def taken(location_id, country_code):
+        return {
+            slug for slug in candidates[location_id]
+            if owners.get((country_code, slug), location_id) != location_id
+        }
+
+    # Rows that can keep their slug claim it first, so new rows never take it over
+    for location_id, (_, location) in batch.items():
+        stored = current.get(location_id)
+        if stored and stored[0] == location.country_code and stored[1] in candidates[location_id] \
+                and stored not in owners:
+            location.slug = stored[1]
+            owners[stored] = location_id
+
+    for location_id, (row_number, location) in list(batch.items()):
+        if location.slug:
+            continue
+        slug = choose_slug(candidates[location_id], taken(location_id, location.country_code))
+        if slug is None:
+            result.add_error(row_number, "No unique slug is available for this title.")
+            del batch[location_id]
+            continue
+        location.slug = slug
+        owners[(location.country_code, slug)] = location_id
+
+
+def upsert_locations(locations):
+    """
+    Insert or update locations with a single INSERT ... ON CONFLICT (id) DO UPDATE.
+
+    The slug uniqueness constraint is deferred so rows of the batch may swap
+    slugs; it is checked at the end of the statement, so a conflict fails
+    here rather than at commit.
+    """
+    Location.objects.bulk_create(
+        locations,
+        update_conflicts=True,
+        unique_fields=['id'],
+        update_fields=LOCATION_UPSERT_FIELDS,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute("SET CONSTRAINTS location_country_slug_uniq IMMEDIATE")
+        cursor.execute("SET CONSTRAINTS location_country_slug_uniq DEFERRED")
+
+
+def flush_batch(batch, result, on_batch=None):
+    """
+    Write a batch of {id: (row_number, location)} entries.
+
+    If the batch statement is rejected by the database, the rows are retried
+    one at a time so only the offending rows are skipped. `on_batch(result)`
+    runs in the same transaction, so progress saved there matches what was
+    committed. Cached responses showing these rows are invalidated once per
+    batch, after the commit.
+    """
+    with transaction.atomic():
+        assign_slugs(batch, result)
+        try:
+            with transaction.atomic():
+                upsert_locations([location for _, location in batch.values()])
+        except DatabaseError:
+            for row_number, location in batch.values():
+                try:
+                    with transaction.atomic():
+                        upsert_locations([location])
+                except DatabaseError as e:
+                    result.add_error(row_number, e)
+        if batch:
+            parent_ids = Location.objects.filter(id__in=list(batch)).values_list('parent_id', flat=True).distinct()
+            bump_generations(location_generations(*batch, *parent_ids))
+        if on_batch:
+            on_batch(result)
+
+
+def fetch_parent_map(ids):
+    """
+    Return {id: parent id} for the given location ids that exist in the database.
+    """
+    ids = list(ids)
+    parent_map = {}
+    for start in range(0, len(ids), PARENT_LOOKUP_BATCH_SIZE):
+        parent_map.update(
+            Location.objects.filter(id__in=ids[start:start + PARENT_LOOKUP_BATCH_SIZE])
+            .values_list('id', 'parent_id')
+        )
+    return parent_map
+
+
+def find_cycle(node, parent_of, done):
+    """
+    Walk up from `node` and return the list of nodes forming a cycle, if any.
+
+    Nodes proven to reach a root are added to `done` so later walks stop early.
+    """
+    path = []
+    position = {}
+    while node is not None and node not in done:
+        if node in position:
+            return path[position[node]:]
+        position[node] = len(path)
+        path.append(node)
+        node = parent_of(node)
+    done.update(path)
+    return None
+
+
+def resolve_parents(parents, result):
+    """
+    Apply the parent links collected from an import in one bulk pass.
+
+    `parents` maps a location id to (row_number, parent id or None). Links to
+    parents that do not exist, and links that would form a cycle, are
+    reported on `result` and left unapplied; everything else is written in
+    topological order within a single transaction.
+    """
+    if not parents:
+        return
+
+    referenced = set(parents) | {parent for _, parent in parents.values() if parent}
+    known = fetch_parent_map(referenced)
+
+    links = {}
+    for child, (row_number, parent) in parents.items():
+        if child not in known:
+            continue  # The row itself failed to import
+        if parent is not None and parent not in known:
+            result.add_parent_error(row_number, f"Parent location '{parent}' does not exist.")
+            continue
+        links[child] = parent
+
+    # Load existing ancestors of the new parents so cycles through rows
+    # outside the file are detected too
+    frontier = {parent for parent in known.values() if parent and parent not in known}
+    while frontier:
+        ancestors = fetch_parent_map(frontier)
+        known.update(ancestors)
+        frontier = {parent for parent in ancestors.values() if parent and parent not in known}
+
+    def parent_of(node):
+        return links[node] if node in links else known.get(node)
+
+    # Rejecting a link puts the old parent back, which can close another
+    # cycle, so check again until a pass rejects nothing
+    rejected = True
+    while rejected:
+        rejected = False
+        done = set()
+        for child in list(links):
+            if child not in links:
+                continue
+            cycle = find_cycle(child, parent_of, done)
+            if not cycle:
+                continue
+            for node in cycle:
+                if node in links:
+                    row_number, parent = parents[node]
+                    result.add_parent_error(row_number, f"Parent location '{parent}' would create a cycle.")
+                    del links[node]
+                    rejected = True
+            # A cycle made only of existing rows is left as it is
+            done.update(cycle)
+
+    depths = {}
+
+    def depth_of(node):
+        chain = []
+        seen = set()
+        while node is not None and node not in depths and node not in seen:
+            chain.append(node)
+            seen.add(node)
+            node = parent_of(node)
+        depth = depths.get(node, -1)
+        for node in reversed(chain):
+            depth += 1
+            depths[node] = depth
+        return depth
+
+    changed = [child for child, parent in links.items() if known[child] != parent]
+    changed.sort(key=depth_of)
+    now = timezone.now()
+    with transaction.atomic():
+        Location.objects.bulk_update(
+            [Location(id=child, parent_id_id=links[child], updated_at=now) for child in changed],
+            ['parent_id', 'updated_at'],
+            batch_size=LOCATION_IMPORT_BATCH_SIZE,
+        )
+        bump_generations(location_generations(
+            *changed, *(known[child] for child in changed), *(links[child] for child in changed)))
+
+
+def import_locations(rows, batch_size=LOCATION_IMPORT_BATCH_SIZE, result=None, skip_rows=0, on_batch=None,
+                     finishing=None, started_at=None):
+    """
+    Create or update Location objects from an iterable of CSV rows (dicts).
+
+    Rows are validated one by one and written in batches. Invalid rows are
+    skipped and recorded on the returned LocationImportResult.
+
+    If the file has a `parent_id` column, parent links are collected in
+    memory and applied once every row has been written, so a child may appear
+    before its parent. A blank `parent_id` makes the location a root.
+
+    To resume an interrupted import, pass the `result` saved so far and the
+    number of rows it covers as `skip_rows`; those rows are not written again,
+    and `started_at`, the time the first attempt began, so the paths of the
+    rows it wrote are rebuilt too.
+
+    `finishing`, if given, is a context manager factory wrapped around the
+    final parent resolution and path rebuild, which save no progress.
+    """
+    if result is None:
+        result = LocationImportResult()
+    # Every row written from here on is saved with a later updated_at
+    started_at = started_at or timezone.now()
+    # Keyed by id so a repeated id keeps its last row, as sequential updates would
+    batch = {}
+    parents = {}
+
+    for index, row in enumerate(rows):
+        row_number = index + 1
+        has_parent = 'parent_id' in row
+        if index < skip_rows:
+            # Already committed; only its parent link is needed
+            if row.get('id') and has_parent:
+                parents[row['id']] = (row_number, row['parent_id'] or None)
+            continue
+
+        result.total_rows = row_number
+        try:
+            location = build_location(row)
+        except Exception as e:
+            result.add_error(row_number, e)
+            continue
+
+        if has_parent:
+            parents[location.id] = (row_number, row['parent_id'] or None)
+        batch.pop(location.id, None)
+        batch[location.id] = (row_number, location)
+        if len(batch) >= batch_size:
+            flush_batch(batch, result, on_batch)
+            batch = {}
+
+    flush_batch(batch, result, on_batch)
+    with finishing() if finishing else nullcontext():
+        resolve_parents(parents, result)
+        # Bulk upserts bypass Location.save(), so bring the subtrees of the rows
+        # written (or re-parented) since the import started up to date in one pass
+        rebuild_location_paths(updated_since=started_at)
+    return result
+
+
+def claim_import_job(stale_after=timedelta(minutes=10)):
+    """
+    Lock and mark as running the oldest pending job.
+
+    A running job that has not saved progress within `stale_after` is assumed
+    to belong to a dead worker and is claimed again so it can resume.
+    """
+    stale_before = timezone.now() - stale_after
+    with transaction.atomic():
+        job = (
+            LocationImportJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                models.Q(status=LocationImportJob.STATUS_PENDING)
+                | models.Q(status=LocationImportJob.STATUS_RUNNING, updated_at__lt=stale_before)
+            )
+            .order_by('created_at')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = LocationImportJob.STATUS_RUNNING
+        job.started_at = job.started_at or timezone.now()
+        job.save(update_fields=['status', 'started_at', 'updated_at'])
+    return job
+
+
+def run_import_job(job, batch_size=LOCATION_IMPORT_BATCH_SIZE):
+    """
+    Process a LocationImportJob, resuming after its last committed chunk.
+
+    Progress counters and a capped error sample are saved with every chunk.
+    """
+    result = LocationImportResult(max_errors=IMPORT_JOB_ERROR_SAMPLE)
+    result.total_rows = job.processed_rows
+    result.skipped_rows = job.skipped_rows
+    result.errors = [tuple(error) for error in job.errors]
+
+    def save_progress(result):
+        job.processed_rows = result.total_rows
+        job.skipped_rows = result.skipped_rows
+        job.errors = result.errors
+        job.save(update_fields=['processed_rows', 'skipped_rows', 'errors', 'updated_at'])
+
+    @contextmanager
+    def lock_job():
+        # No progress is saved while parents are resolved, so hold the job's row
+        # lock instead; claim_import_job skips locked rows however stale they look
+        with transaction.atomic():
+            LocationImportJob.objects.select_for_update().get(pk=job.pk)
+            yield
+
+    try:
+        with job.csv_file.open('rb') as csv_file:
+            import_locations(
+                read_location_csv(csv_file),
+                batch_size=batch_size,
+                result=result,
+                skip_rows=job.processed_rows,
+                on_batch=save_progress,
+                finishing=lock_job,
+                started_at=job.started_at,
+            )
+    except Exception as e:
+        job.status = LocationImportJob.STATUS_FAILED
+        job.message = str(e)
+    else:
+        job.status = LocationImportJob.STATUS_COMPLETED
+        if result.unresolved_parents:
+            job.message = f"{result.unresolved_parents} parent links could not be resolved."
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'message', 'finished_at', 'updated_at'])
+    return job
@@ -0,0 +1,377 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import connection, transaction
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+from .caching import accommodation_generations, bump_generations
+from .facets import facet_key_sql
+from .importers import parse_point
+from .models import Accommodation, AccommodationFacet, Location
+from .search import DEFAULT_SEARCH_CONFIG
+
+# Rows sent per COPY and merged per INSERT ... ON CONFLICT statement
+INGEST_BATCH_SIZE = 10000
+
+# Per-row error messages kept for the report
+INGEST_ERROR_SAMPLE = 50
+
+STAGE_TABLE = 'accommodation_ingest_stage'
+
+# Staging columns, in COPY order. `ordinal` is the row number in the feed,
+# so the last occurrence of a repeated (id, feed) wins.
+STAGE_COLUMNS = [
+    ('ordinal', 'bigint'),
+    ('id', 'varchar(20)'),
+    ('feed', 'smallint'),
+    ('title', 'varchar(100)'),
+    ('country_code', 'varchar(2)'),
+    ('bedroom_count', 'integer'),
+    ('review_score', 'numeric(3, 1)'),
+    ('usd_rate', 'numeric(10, 2)'),
+    ('center', 'text'),  # EWKT
+    ('images', 'jsonb'),
+    ('amenities', 'jsonb'),
+    ('location_id', 'varchar(20)'),
+    ('published', 'boolean'),
+]
+
+# Accommodation columns refreshed when a row with the same (id, feed) exists
+MERGE_UPDATE_COLUMNS = [
+    'title', 'country_code', 'bedroom_count', 'review_score', 'usd_rate', 'center',
+    'images', 'amenities', 'location_id_id', 'published',
+]
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'n', ''}
+
+
+class IngestResult:
+    """
+    Counters and a sample of per-row errors collected while ingesting a feed.
+    """
+
+    def __init__(self, max_errors=INGEST_ERROR_SAMPLE):
+        self.total_rows = 0
+        self.skipped_rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.duplicates = 0  # Rows superseded by a later row with the same (id, feed) in their batch
+        self.errors = []
+        self.max_errors = max_errors
+        self.countries = set()
+
+    def add_error(self, row_number, error):
+        self.skipped_rows += 1
+        if self.max_errors is None or len(self.errors) < self.max_errors:
+            self.errors.append((row_number, str(error)))
+
+
+def read_feed(lines, feed_format):
+    """
+    Lazily parse an NDJSON or CSV feed from an iterable of text lines into dicts.
+
+    Malformed NDJSON lines are yielded as their ValueError, so they are
+    reported against their row instead of aborting the run.
+    """
+    if feed_format == 'csv':
+        yield from csv.DictReader(lines)
+        return
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield ValueError(f"Invalid JSON: {e}")
+
+
+def text(row, field, max_length):
+    value = str(row.get(field) or '').strip()
+    if not value:
+        raise ValueError(f"`{field}` is required.")
+    if len(value) > max_length:
+        raise ValueError(f"`{field}` is longer than {max_length} characters.")
+    return value
+
+
+def number(row, field, max_digits, decimal_places):
+    try:
+        value = Decimal(str(row.get(field)).strip()).quantize(Decimal(1).scaleb(-decimal_places))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"`{field}` must be a number.")
+    if value < 0 or value.adjusted() >= max_digits - decimal_places:
+        raise ValueError(f"`{field}` is out of range.")
+    return value
+
+
+def json_value(row, field):
+    value = row.get(field)
+    if isinstance(value, str):
+        try:
+            value = json.loads(value) if value.strip() else {}
+        except ValueError:
+            raise ValueError(f"`{field}` must be valid JSON.")
+    if not isinstance(value, (dict, list)):
+        raise ValueError(f"`{field}` must be a JSON object or array.")
+    return json.dumps(value, separators=(',', ':'))
+
+
+def center(row):
+    """
+    Read the point from `center` (WKT string or [lon, lat]) or from `lon`/`lat`.
+    """
+    value = row.get('center')
+    if isinstance(value, str) and value.strip():
+        point = parse_point(value)
+        lon, lat = point.x, point.y
+    else:
+        try:
+            lon, lat = (float(value[0]), float(value[1])) if value else (float(row['lon']), float(row['lat']))
+        except (KeyError, IndexError, TypeError, ValueError):
+            raise ValueError("`center` must be a POINT, a [lon, lat] pair, or `lon` and `lat`.")
+    if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+        raise ValueError("`center` is outside [-180, 180] x [-90, 90].")
+    return f"SRID=4326;POINT({lon!r} {lat!r})"
+
+
+def boolean(row, field):
+    value = row.get(field, False)
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f"`{field}` must be true or false.")
+
+
+def clean_row(row, feed=None):
+    """
+    Validate a feed row and return its staging values (without `ordinal`).
+
+    `feed`, when given, overrides the row's own feed. Raises ValueError.
+    """
+    if isinstance(row, Exception):
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError("Row must be a JSON object.")
+    if feed is None:
+        try:
+            feed = int(row.get('feed'))
+        except (TypeError, ValueError):
+            raise ValueError("`feed` must be an integer.")
+    if not 0 <= feed <= 32767:
+        raise ValueError("`feed` is out of range.")
+    try:
+        bedroom_count = int(row.get('bedroom_count'))
+    except (TypeError, ValueError):
+        raise ValueError("`bedroom_count` must be an integer.")
+    if bedroom_count < 0:
+        raise ValueError("`bedroom_count` is out of range.")
+    return (
+        text(row, 'id', 20),
+        feed,
+        text(row, 'title', 100),
+        text(row, 'country_code', 2).upper(),
+        bedroom_count,
+        number(row, 'review_score', 3, 1) if row.get('review_score') not in (None, '') else Decimal('0.0'),
+        number(row, 'usd_rate', 10, 2),
+        center(row),
+        json_value(row, 'images'),
+        json_value(row, 'amenities'),
+        text(row, 'location_id', 20),
+        boolean(row, 'published'),
+    )
+
+
+def clean_rows(rows, result, feed=None):
+    """
+    Yield (row number, *staging values) for every valid row, recording the rest on `result`.
+    """
+    for row_number, row in enumerate(rows, start=1):
+        result.total_rows = row_number
+        try:
+            values = clean_row(row, feed)
+        except Exception as e:
+            result.add_error(row_number, e)
+            continue
+        result.countries.add(values[3])
+        yield (row_number, *values)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def create_stage_table(cursor):
+    columns = ', '.join(f"{name} {type_}" for name, type_ in STAGE_COLUMNS)
+    cursor.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {STAGE_TABLE} ({columns}) ON COMMIT DELETE ROWS")
+
+
+def copy_rows(cursor, rows):
+    """
+    Load rows into the staging table with COPY, through psycopg 3 or psycopg2.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    sql = f"COPY {STAGE_TABLE} ({', '.join(name for name, _ in STAGE_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+    if is_psycopg3:
+        with cursor.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+    else:
+        buffer.seek(0)
+        cursor.copy_expert(sql, buffer)
+
+
+REJECT_MESSAGES = {
+    'location': "Location '{location_id}' does not exist.",
+    'feed': "Accommodation '{id}' already belongs to another feed.",
+    'batch': "Accommodation '{id}' appears with more than one feed.",
+}
+
+
+def reject_sql():
+    """
+    Remove and return the staged rows that cannot be merged.
+
+    Accommodations are addressed by id alone outside this table (see
+    polls/partitions.py), so an id may not move to, or appear in, a second feed.
+    """
+    table = connection.ops.quote_name(Accommodation._meta.db_table)
+    locations = connection.ops.quote_name(Location._meta.db_table)
+    missing_location = f"NOT EXISTS (SELECT 1 FROM {locations} l WHERE l.id = s.location_id)"
+    other_feed = f"EXISTS (SELECT 1 FROM {table} a WHERE a.id = s.id AND a.feed <> s.feed)"
+    staged_feed = f"EXISTS (SELECT 1 FROM {STAGE_TABLE} t WHERE t.id = s.id AND t.feed <> s.feed)"
+    return f"""
+        DELETE FROM {STAGE_TABLE} AS s
+        WHERE {missing_location} OR {other_feed} OR {staged_feed}
+        RETURNING s.ordinal, s.id, s.location_id,
+            CASE WHEN {missing_location} THEN 'location' WHEN {other_feed} THEN 'feed' ELSE 'batch' END
+    """
+
+
+def lock_sql():
+    """
+    Lock the stored rows the staged rows will merge into.
+
+    The merge reads their facet keys from its snapshot, so they must not
+    change between that read and the update (see polls/signals.py).
+    """
+    table = connection.ops.quote_name(Accommodation._meta.db_table)
+    return f"""
+        SELECT 1 FROM {table} a JOIN {STAGE_TABLE} s ON a.id = s.id AND a.feed = s.feed
+        ORDER BY a.id, a.feed
+        FOR UPDATE OF a
+    """
+
+
+def merge_sql():
+    table = connection.ops.quote_name(Accommodation._meta.db_table)
+    facet_table = connection.ops.quote_name(AccommodationFacet._meta.db_table)
+    updates = ', '.join(f"{column} = EXCLUDED.{column}" for column in MERGE_UPDATE_COLUMNS)
+    # Compare geometries as EWKB: `=` on geometry does not test exact equality everywhere
+    current = ', '.join('ST_AsEWKB(a.center)' if c == 'center' else f"a.{c}" for c in MERGE_UPDATE_COLUMNS)
+    incoming = ', '.join('ST_AsEWKB(EXCLUDED.center)' if c == 'center' else f"EXCLUDED.{c}" for c in MERGE_UPDATE_COLUMNS)
+    return f"""
+        WITH source AS (
+            SELECT DISTINCT ON (s.id, s.feed) s.*
+            FROM {STAGE_TABLE} s
+            ORDER BY s.id, s.feed, s.ordinal DESC
+        ),
+        previous AS (
+            SELECT a.id, a.feed, a.country_code, a.published, a.bedroom_count, a.usd_rate
+            FROM {table} a JOIN source s ON a.id = s.id AND a.feed = s.feed
+        ),
+        merged AS (
+            INSERT INTO {table} AS a (
+                id, feed, title, country_code, bedroom_count, review_score, usd_rate, center,
+                images, amenities, location_id_id, user_id_id, published, created_at, updated_at, search_vector
+            )
+            SELECT id, feed, title, country_code, bedroom_count, review_score, usd_rate, ST_GeomFromEWKT(center),
+                images, amenities, location_id, NULL, published, now(), now(), to_tsvector(%s, title)
+            FROM source
+            ON CONFLICT (id, feed) DO UPDATE SET {updates},
+                updated_at = EXCLUDED.updated_at, search_vector = EXCLUDED.search_vector
+            WHERE ({current}) IS DISTINCT FROM ({incoming})
+            RETURNING a.id, a.feed, a.country_code, a.published, a.bedroom_count, a.usd_rate, (xmax = 0) AS inserted
+        ),
+        replaced AS (
+            SELECT p.* FROM previous p JOIN merged m ON m.id = p.id AND m.feed = p.feed
+        ),
+        facet_deltas AS (
+            SELECT {facet_key_sql('m')}, 1 AS delta FROM merged m
+            UNION ALL
+            SELECT {facet_key_sql('r')}, -1 FROM replaced r
+        ),
+        facets AS (
+            INSERT INTO {facet_table} AS facet (country_code, published, bedroom_bucket, price_band, count)
+            SELECT country_code, published, bedroom_bucket, price_band, sum(delta)
+            FROM facet_deltas
+            GROUP BY 1, 2, 3, 4
+            HAVING sum(delta) <> 0
+            ON CONFLICT (country_code, published, bedroom_bucket, price_band)
+            DO UPDATE SET count = facet.count + EXCLUDED.count
+        )
+        SELECT
+            (SELECT count(*) FROM {STAGE_TABLE}) - (SELECT count(*) FROM source),
+            count(*) FILTER (WHERE inserted),
+            count(*) FILTER (WHERE NOT inserted),
+            ARRAY(SELECT DISTINCT country_code FROM replaced)
+        FROM merged
+    """
+
+
+def merge_batch(cursor, batch, result):
+    """
+    COPY one batch into the staging table and merge it into Accommodation in one statement.
+
+    Rows whose location does not exist or whose id belongs to another feed
+    are skipped, and only the last of several rows with the same (id, feed)
+    is merged. Rows identical to the stored version are left untouched so
+    they cost no write. The facet counts of the inserted and updated rows
+    are adjusted by the same statement.
+    """
+    with transaction.atomic():
+        # Emptied on commit, but not when this runs inside an outer transaction
+        cursor.execute(f"TRUNCATE {STAGE_TABLE}")
+        copy_rows(cursor, batch)
+        cursor.execute(reject_sql())
+        rejected = sorted(cursor.fetchall())
+        cursor.execute(lock_sql())
+        cursor.execute(merge_sql(), [DEFAULT_SEARCH_CONFIG])
+        duplicates, inserted, updated, previous = cursor.fetchone()
+    for row_number, accommodation_id, location_id, reason in rejected:
+        result.add_error(row_number, REJECT_MESSAGES[reason].format(id=accommodation_id, location_id=location_id))
+    result.duplicates += duplicates
+    result.inserted += inserted
+    result.updated += updated
+    result.unchanged += len(batch) - len(rejected) - duplicates - inserted - updated
+    result.countries.update(previous)
+
+
+def ingest_accommodations(rows, feed=None, batch_size=INGEST_BATCH_SIZE, result=None, on_batch=None):
+    """
+    Insert or update accommodations from an iterable of feed rows (dicts).
+
+    Rows are validated in a generator pipeline, COPY'd into a temporary
+    staging table in batches and merged by (id, feed), so memory use is
+    bounded by `batch_size`. Cached responses are invalidated once at the
+    end. Returns an IngestResult.
+    """
+    if result is None:
+        result = IngestResult()
+    with connection.cursor() as cursor:
+        create_stage_table(cursor)
+        for batch in batched(clean_rows(rows, result, feed), batch_size):
+            merge_batch(cursor, batch, result)
+            if on_batch:
+                on_batch(result)
+    if result.inserted or result.updated:
+        bump_generations(accommodation_generations(*result.countries))
+    return result
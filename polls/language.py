@@ -0,0 +1,172 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from langdetect import DetectorFactory, LangDetectException, detect
+from langdetect import detector_factory
+
+logger = logging.getLogger(__name__)
+
+# langdetect is randomised by default; a fixed seed makes results repeatable and safe to cache
+DetectorFactory.seed = 0
+
+# Number of detection results kept, keyed by a hash of the text
+DETECTION_CACHE_SIZE = 4096
+
+_cache = OrderedDict()
+_cache_lock = Lock()
+
+
+# Timing of the last profile preload in this process, see warm_up()
+warm_up_report = None
+
+
+def warm_up():
+    """
+    Load langdetect's language profiles now instead of on the first detect() call.
+
+    Profiles are loaded once per process. Returns a dict with the number of
+    profiles, the load time in milliseconds and the process id.
+    """
+    global warm_up_report
+    start = time.perf_counter()
+    detector_factory.init_factory()
+    # Run one detection so the detector code path is exercised as well
+    detect("warm up")
+    warm_up_report = {
+        'profiles': len(detector_factory._factory.get_lang_list()),
+        'milliseconds': round((time.perf_counter() - start) * 1000, 1),
+        'pid': os.getpid(),
+    }
+    return warm_up_report
+
+
+def preload_profiles():
+    """
+    Warm up langdetect in a server process, if LANGDETECT_PRELOAD is set.
+
+    Called from the WSGI/ASGI entry points rather than AppConfig.ready(), so
+    management commands and tests do not pay for it.
+    """
+    if not getattr(settings, 'LANGDETECT_PRELOAD', True):
+        return
+    report = warm_up()
+    logger.info(
+        "Loaded %d language profiles in %.1f ms (pid %d)",
+        report['profiles'], report['milliseconds'], report['pid']
+    )
+
+
+def _text_key(text):
+    return hashlib.sha1(text.encode('utf-8')).digest()
+
+
+def clear_detection_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def detect_languages(texts):
+    """
+    Detect the language of each text, returning a list of codes in the same order.
+
+    Texts that cannot be detected map to None. Each distinct text is detected
+    at most once, and recent results are served from a bounded LRU cache.
+    """
+    keys = [_text_key(text) for text in texts]
+    results = {}
+    missing = {}
+
+    with _cache_lock:
+        for key, text in zip(keys, texts):
+            if key in _cache:
+                _cache.move_to_end(key)
+                results[key] = _cache[key]
+            else:
+                missing[key] = text
+
+    for key, text in missing.items():
+        try:
+            results[key] = detect(text)
+        except LangDetectException:
+            results[key] = None
+
+    with _cache_lock:
+        for key in missing:
+            _cache[key] = results[key]
+        while len(_cache) > DETECTION_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return [results[key] for key in keys]
+
+
+def localization_errors(language, description, policy):
+    """
+    Return a {field: message} dict of language problems in a localization.
+    """
+    if not isinstance(policy, dict):
+        return {'policy': "Policy must be a valid JSON object."}
+
+    policy_items = list(policy.items())
+    texts = [description or ''] + [value for _, value in policy_items if isinstance(value, str)]
+    detected = iter(detect_languages(texts))
+    errors = {}
+
+    description_lang = next(detected)
+    if description_lang is None:
+        errors['description'] = "Language detection failed. Please ensure the text is valid."
+    elif description_lang != language:
+        errors['description'] = f"The description must be written in {language.upper()}."
+
+    for key, value in policy_items:
+        value_lang = next(detected) if isinstance(value, str) else None
+        if value_lang is None:
+            errors['policy'] = f"Language detection failed for policy value '{key}'. Please ensure the text is valid."
+            break
+        if value_lang != language:
+            errors['policy'] = f"Policy value for '{key}' must be written in {language.upper()}."
+            break
+
+    return errors
+
+
+def validate_localization(localization):
+    """
+    Raise ValidationError unless the description and policy values of a
+    LocalizeAccommodation are written in its language.
+
+    The result is remembered on the instance, so the admin form, save_model()
+    and save() validating the same content only run detection once.
+    """
+    signature = (
+        localization.language,
+        localization.description,
+        json.dumps(localization.policy, sort_keys=True, default=str),
+    )
+    if getattr(localization, '_validated_localization', None) == signature:
+        return
+
+    errors = localization_errors(localization.language, localization.description, localization.policy)
+    if errors:
+        raise ValidationError(errors)
+    localization._validated_localization = signature
+
+
+def check_localizations(rows):
+    """
+    Check a chunk of (id, property_id, language, description, policy) rows.
+
+    Returns a list of violation dicts. This has no database or model access so
+    it can run in a worker process.
+    """
+    violations = []
+    for pk, property_id, language, description, policy in rows:
+        errors = localization_errors(language, description, policy)
+        if errors:
+            violations.append({'id': pk, 'property_id': property_id, 'language': language, 'errors': errors})
+    return violations
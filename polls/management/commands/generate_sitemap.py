@@ -1,12 +1,63 @@
 import json
+import os
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from polls.models import Location
+from polls.sitemaps import (
+    SITEMAP_CHUNK_SIZE, SITEMAP_MAX_URLS, write_incremental_sitemap, write_sitemap, write_xml_sitemaps,
+)
 
 
 class Command(BaseCommand):
     help = 'Generate sitemap.json'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--stream', action='store_true',
+                            help='Read only the needed columns through a cursor and write the file as it goes.')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only regenerate countries whose locations changed since the last run (implies --stream).')
+        parser.add_argument('--output', default='sitemap.json', help='Path of the sitemap file.')
+        parser.add_argument('--fragments-dir', default='sitemap_fragments',
+                            help='Directory for the per-country fragments kept by --incremental.')
+        parser.add_argument('--state-file', default='sitemap_state.json',
+                            help='Per-country counts and last update times kept by --incremental.')
+        parser.add_argument('--chunk-size', type=int, default=SITEMAP_CHUNK_SIZE,
+                            help='Rows fetched per database round trip.')
+        parser.add_argument('--xml', action='store_true',
+                            help='Also write gzipped XML sitemaps, sharded per country, and a sitemap.xml index.')
+        parser.add_argument('--xml-dir', default='sitemaps', help='Directory for the XML sitemaps.')
+        parser.add_argument('--base-url', default=getattr(settings, 'SITEMAP_BASE_URL', 'http://localhost:8000'),
+                            help='Site URL that location paths are appended to.')
+        parser.add_argument('--shards-url', default=None,
+                            help='Public URL of --xml-dir, used in the index (default: <base-url>/<xml-dir name>).')
+        parser.add_argument('--urls-per-shard', type=int, default=SITEMAP_MAX_URLS,
+                            help='Maximum URLs per XML sitemap file.')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Processes rendering countries in parallel (default: CPU count; 1 renders in-process).')
+
     def handle(self, *args, **kwargs):
+        self.write_json(**kwargs)
+        if kwargs['xml']:
+            shards_url = kwargs['shards_url'] or f"{kwargs['base_url'].rstrip('/')}/{os.path.basename(os.path.normpath(kwargs['xml_dir']))}"
+            shards = write_xml_sitemaps(
+                kwargs['xml_dir'], kwargs['base_url'], shards_url,
+                workers=kwargs['workers'], max_urls=kwargs['urls_per_shard'], chunk_size=kwargs['chunk_size'],
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"{os.path.join(kwargs['xml_dir'], 'sitemap.xml')} generated with {shards} sitemap files."))
+
+    def write_json(self, **kwargs):
+        if kwargs['incremental']:
+            changed, removed = write_incremental_sitemap(
+                kwargs['output'], kwargs['fragments_dir'], kwargs['state_file'], kwargs['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"{kwargs['output']} generated: {len(changed)} countries regenerated, {len(removed)} removed."))
+            return
+        if kwargs['stream']:
+            countries = write_sitemap(kwargs['output'], kwargs['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(f"{kwargs['output']} generated with {countries} countries."))
+            return
+
         # Get all locations ordered by title
         locations = Location.objects.order_by('title')
 
@@ -19,9 +70,8 @@ class Command(BaseCommand):
             if location.country_code not in countries:
                 countries[location.country_code] = {"name": location.country_code, "locations": []}
             
-            # Sanitize the location title and prepare the URL
-            location_slug = location.title.lower().replace(' ', '-')
-            location_url = f"{location.country_code.lower()}/{location_slug}"
+            # Prepare the URL from the stored slug
+            location_url = f"{location.country_code.lower()}/{location.slug}"
 
             # Append location to the appropriate country
             countries[location.country_code]["locations"].append(
@@ -33,7 +83,7 @@ class Command(BaseCommand):
 
         # Save the sitemap to a file
         try:
-            with open('sitemap.json', 'w') as f:
+            with open(kwargs['output'], 'w') as f:
                 json.dump(sitemap, f, indent=4)
             self.stdout.write(self.style.SUCCESS("sitemap.json generated successfully!"))
         except Exception as e:
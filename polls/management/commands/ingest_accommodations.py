@@ -0,0 +1,62 @@
+import gzip
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from polls.ingest import INGEST_BATCH_SIZE, ingest_accommodations, read_feed
+
+FEED_FORMATS = ['ndjson', 'csv']
+
+
+def feed_format(path):
+    """
+    Guess the feed format from the file name, ignoring a trailing .gz.
+    """
+    name = path.removesuffix('.gz')
+    return 'csv' if name.endswith('.csv') else 'ndjson'
+
+
+def open_feed(path):
+    if path == '-':
+        return sys.stdin
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+class Command(BaseCommand):
+    help = 'Insert or update accommodations from an NDJSON or CSV feed using COPY'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Feed file (optionally gzipped), or '-' for standard input.")
+        parser.add_argument('--format', choices=FEED_FORMATS, help='Feed format (default: from the file extension).')
+        parser.add_argument('--feed', type=int, help="Feed number for every row, overriding the rows' own `feed`.")
+        parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE, help='Rows per COPY and merge.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            feed_file = open_feed(path)
+        except OSError as e:
+            raise CommandError(f"Cannot open '{path}': {e}")
+
+        start = time.perf_counter()
+
+        def progress(result):
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"{result.total_rows} rows read ({result.total_rows / elapsed:.0f} rows/s)")
+
+        with feed_file:
+            rows = read_feed(feed_file, options['format'] or feed_format(path))
+            result = ingest_accommodations(
+                rows, feed=options['feed'], batch_size=options['batch_size'], on_batch=progress
+            )
+
+        elapsed = time.perf_counter() - start
+        rate = result.total_rows / elapsed if elapsed else 0
+        for row_number, message in result.errors:
+            self.stderr.write(f"Row {row_number}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {result.total_rows} rows in {elapsed:.1f}s ({rate:.0f} rows/s): "
+            f"{result.inserted} inserted, {result.updated} updated, {result.unchanged} unchanged, "
+            f"{result.duplicates} duplicates, {result.skipped_rows} skipped."
+        ))
@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+from polls.partitions import (
+    attach_partition, create_partition, create_staging, delete_localizations, detach_partition, drop_table,
+    list_partitions, partition_name, prepare_table, refresh_derived_data, staging_name, swap_partition, table_exists,
+)
+
+
+class Command(BaseCommand):
+    help = 'Create, attach, detach and swap the per-feed partitions of the accommodation table'
+
+    def add_arguments(self, parser):
+        actions = parser.add_subparsers(dest='action', required=True)
+
+        actions.add_parser('list', help='List partitions with their bounds and estimated row counts.')
+
+        create = actions.add_parser('create', help="Create a feed's partition, moving its rows out of the default partition.")
+        create.add_argument('feed', type=int)
+
+        stage = actions.add_parser('stage', help='Create an empty staging table to load a feed into.')
+        stage.add_argument('feed', type=int)
+
+        attach = actions.add_parser('attach', help="Attach a loaded table as a feed's partition.")
+        attach.add_argument('feed', type=int)
+        attach.add_argument('--table', help='Table to attach (default: the feed\'s staging table).')
+
+        detach = actions.add_parser('detach', help="Detach a feed's partition, keeping it as a standalone table.")
+        detach.add_argument('feed', type=int)
+        detach.add_argument('--concurrently', action='store_true', help='Do not block other feeds while detaching.')
+        detach.add_argument('--drop', action='store_true', help='Drop the table once detached.')
+
+        swap = actions.add_parser('swap', help="Replace a feed's partition with its loaded staging table.")
+        swap.add_argument('feed', type=int)
+        swap.add_argument('--table', help='Loaded table to swap in (default: the feed\'s staging table).')
+        swap.add_argument('--keep-old', action='store_true', help='Keep the replaced partition as a standalone table.')
+
+    def handle(self, *args, **options):
+        try:
+            getattr(self, f"handle_{options['action']}")(options)
+        except (DatabaseError, ValueError) as e:
+            raise CommandError(str(e))
+
+    def handle_list(self, options):
+        for table, bound, rows in list_partitions():
+            self.stdout.write(f"{table}\t{bound}\t~{max(rows, 0)} rows")
+
+    def handle_create(self, options):
+        if create_partition(options['feed']):
+            self.stdout.write(self.style.SUCCESS(f"Created {partition_name(options['feed'])}."))
+        else:
+            self.stdout.write(f"{partition_name(options['feed'])} already exists.")
+
+    def handle_stage(self, options):
+        table = create_staging(options['feed'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {table}. Load feed {options['feed']} into it, then run: swap {options['feed']}"))
+
+    def handle_attach(self, options):
+        table = options['table'] or staging_name(options['feed'])
+        prepare_table(table, options['feed'])
+        attach_partition(table, options['feed'])
+        refresh_derived_data([table])
+        self.stdout.write(self.style.SUCCESS(f"Attached {table} for feed {options['feed']}."))
+
+    def handle_detach(self, options):
+        name = partition_name(options['feed'])
+        detach_partition(options['feed'], concurrently=options['concurrently'])
+        refresh_derived_data([name])
+        if options['drop']:
+            delete_localizations(name)
+            drop_table(name)
+            self.stdout.write(self.style.SUCCESS(f"Detached and dropped {name}."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Detached {name}; it is now a standalone table."))
+
+    def handle_swap(self, options):
+        table = options['table'] or staging_name(options['feed'])
+        if not table_exists(table):
+            raise CommandError(f"{table} does not exist; create it with: stage {options['feed']}")
+        old = swap_partition(options['feed'], table, keep_old=options['keep_old'])
+        message = f"Swapped {table} in as {partition_name(options['feed'])}."
+        if old:
+            message += f" The previous data is kept in {old}."
+        self.stdout.write(self.style.SUCCESS(message))
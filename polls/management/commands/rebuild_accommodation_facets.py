@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from polls.facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed accommodation facet counts'
+
+    def handle(self, *args, **kwargs):
+        rebuild_facets()
+        self.stdout.write(self.style.SUCCESS("Accommodation facet counts rebuilt."))
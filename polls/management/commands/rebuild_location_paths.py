@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from polls.hierarchy import rebuild_location_paths
+
+
+class Command(BaseCommand):
+    help = 'Recompute the materialized path and depth of every Location'
+
+    def handle(self, *args, **kwargs):
+        updated = rebuild_location_paths()
+        self.stdout.write(self.style.SUCCESS(f"Location paths rebuilt. {updated} rows updated."))
@@ -0,0 +1,88 @@
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time as datetime_time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from polls.language import check_localizations, warm_up
+from polls.models import LocalizeAccommodation
+
+
+def parse_since(value):
+    """
+    Parse an ISO date or datetime into an aware datetime.
+    """
+    since = parse_datetime(value)
+    if since is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Invalid --since value '{value}'. Use YYYY-MM-DD or an ISO datetime.")
+        since = datetime.combine(day, datetime_time.min)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+class Command(BaseCommand):
+    help = 'Re-check LocalizeAccommodation rows against the language rules in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--language', help='Only check localizations in this language code.')
+        parser.add_argument('--since', help='Only check localizations updated at or after this date/datetime.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of worker processes.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per chunk sent to a worker.')
+        parser.add_argument(
+            '--output', default='localization_violations.jsonl',
+            help='File the violations are written to, one JSON object per line.'
+        )
+
+    def handle(self, *args, **options):
+        rows = LocalizeAccommodation.objects.order_by('pk')
+        if options['language']:
+            rows = rows.filter(language=options['language'])
+        if options['since']:
+            rows = rows.filter(updated_at__gte=parse_since(options['since']))
+        rows = rows.values_list('pk', 'property_id', 'language', 'description', 'policy')
+
+        chunk_size = options['chunk_size']
+        max_pending = options['workers'] * 2
+        checked = 0
+        violations = 0
+        start = time.perf_counter()
+
+        # Workers only run language detection; all database reads stay in this process
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=warm_up) as pool, \
+                open(options['output'], 'w') as report:
+            pending = deque()
+
+            def collect(future):
+                nonlocal violations
+                for violation in future.result():
+                    report.write(json.dumps(violation, separators=(',', ':')) + '\n')
+                    violations += 1
+
+            chunk = []
+            for row in rows.iterator(chunk_size=chunk_size):
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    pending.append(pool.submit(check_localizations, chunk))
+                    checked += len(chunk)
+                    chunk = []
+                    # Bound the rows held in memory while workers catch up
+                    if len(pending) >= max_pending:
+                        collect(pending.popleft())
+            if chunk:
+                pending.append(pool.submit(check_localizations, chunk))
+                checked += len(chunk)
+            while pending:
+                collect(pending.popleft())
+
+        elapsed = time.perf_counter() - start
+        rate = checked / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} localizations in {elapsed:.1f}s ({rate:.0f} rows/s). "
+            f"{violations} violations written to {options['output']}."
+        ))
@@ -0,0 +1,40 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from polls.importers import claim_import_job, run_import_job
+
+
+class Command(BaseCommand):
+    help = 'Process queued location CSV import jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when no job is waiting instead of polling.')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to wait between polls (default 5).')
+        parser.add_argument(
+            '--stale-after', type=int, default=10,
+            help='Minutes without progress after which a running job is resumed (default 10).'
+        )
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(minutes=options['stale_after'])
+
+        while True:
+            job = claim_import_job(stale_after)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+
+            if job.processed_rows:
+                self.stdout.write(f"Resuming import job #{job.pk} after row {job.processed_rows}")
+            else:
+                self.stdout.write(f"Starting import job #{job.pk}")
+
+            run_import_job(job)
+            if job.status == job.STATUS_COMPLETED:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Import job #{job.pk} complete. {job.imported_rows} rows imported, {job.skipped_rows} rows skipped."
+                ))
+            else:
+                self.stderr.write(self.style.ERROR(f"Import job #{job.pk} failed: {job.message}"))
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.3 on 2026-10-17 09:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='localizeaccommodation',
+            name='property_id',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='localized_versions', to='polls.accommodation'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='localizeaccommodation',
+            unique_together={('property_id', 'language')},
+        ),
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=models.Index(fields=['feed'], name='polls_accom_feed_59a5cf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='localizeaccommodation',
+            index=models.Index(fields=['language'], name='polls_local_languag_56fbda_idx'),
+        ),
+        migrations.CreateModel(
+            name='LocationImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('csv_file', models.FileField(upload_to='location_imports/')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('processed_rows', models.PositiveIntegerField(default=0)),
+                ('skipped_rows', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('message', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='polls_locat_status_95a132_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-17 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0002_locationimportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='localizeaccommodation',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
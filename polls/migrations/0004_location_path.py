@@ -0,0 +1,40 @@
+# Generated by Django 5.1.3 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0003_localizeaccommodation_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='path',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(fields=['path'], name='polls_location_path_idx', opclasses=['text_pattern_ops']),
+        ),
+        migrations.RunSQL(
+            sql="""
+                WITH RECURSIVE tree (id, path, depth) AS (
+                    SELECT id, '/' || id || '/', 0 FROM polls_location WHERE parent_id_id IS NULL
+                    UNION ALL
+                    SELECT child.id, tree.path || child.id || '/', tree.depth + 1
+                    FROM polls_location AS child JOIN tree ON child.parent_id_id = tree.id
+                )
+                UPDATE polls_location AS location SET path = tree.path, depth = tree.depth
+                FROM tree WHERE location.id = tree.id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.3 on 2026-10-17 12:02
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Build the indexes without blocking writes to a large table
+    atomic = False
+
+    dependencies = [
+        ('polls', '0004_location_path'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='accommodation',
+            index=models.Index(condition=models.Q(('published', True)), fields=['country_code', 'usd_rate', 'id'], name='acc_pub_country_rate_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='accommodation',
+            index=models.Index(condition=models.Q(('published', True)), fields=['country_code', 'review_score', 'id'], name='acc_pub_country_score_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='accommodation',
+            index=models.Index(condition=models.Q(('published', True)), fields=['country_code', 'bedroom_count', 'id'], name='acc_pub_country_beds_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='accommodation',
+            index=models.Index(condition=models.Q(('published', True)), fields=['usd_rate', 'id'], name='acc_pub_rate_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='accommodation',
+            index=models.Index(fields=['location_id', 'usd_rate'], name='acc_location_rate_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.3 on 2026-10-17 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0005_accommodation_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccommodationFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country_code', models.CharField(max_length=2)),
+                ('published', models.BooleanField()),
+                ('bedroom_bucket', models.PositiveSmallIntegerField()),
+                ('price_band', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('country_code', 'published', 'bedroom_bucket', 'price_band'), name='accommodation_facet_unique')],
+            },
+        ),
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO polls_accommodationfacet (country_code, published, bedroom_bucket, price_band, count)
+                SELECT country_code, published, LEAST(bedroom_count, 5),
+                    CASE WHEN usd_rate < 50 THEN 0 WHEN usd_rate < 100 THEN 1
+                        WHEN usd_rate < 200 THEN 2 WHEN usd_rate < 500 THEN 3 ELSE 4 END,
+                    count(*)
+                FROM polls_accommodation
+                GROUP BY 1, 2, 3, 4
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
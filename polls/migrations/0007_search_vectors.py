@@ -0,0 +1,67 @@
+# Generated by Django 5.1.3 on 2026-10-17 13:15
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Frozen copies of polls.search.SEARCH_CONFIGS and DEFAULT_SEARCH_CONFIG as of
+# this migration, so later edits to the app cannot change what it does
+SEARCH_CONFIGS = {
+    'da': 'danish',
+    'de': 'german',
+    'en': 'english',
+    'es': 'spanish',
+    'fi': 'finnish',
+    'fr': 'french',
+    'hu': 'hungarian',
+    'it': 'italian',
+    'nl': 'dutch',
+    'no': 'norwegian',
+    'pt': 'portuguese',
+    'ro': 'romanian',
+    'ru': 'russian',
+    'sv': 'swedish',
+    'tr': 'turkish',
+}
+DEFAULT_SEARCH_CONFIG = 'simple'
+
+# Pick each localization's text search configuration from its language code
+LANGUAGE_CONFIG_SQL = "CASE lower(language) {} ELSE '{}' END::regconfig".format(
+    ' '.join(f"WHEN '{language}' THEN '{config}'" for language, config in SEARCH_CONFIGS.items()),
+    DEFAULT_SEARCH_CONFIG,
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0006_accommodationfacet'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accommodation',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='localizeaccommodation',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            sql=[
+                f"UPDATE polls_accommodation SET search_vector = to_tsvector('{DEFAULT_SEARCH_CONFIG}', COALESCE(title, ''))",
+                f"UPDATE polls_localizeaccommodation SET search_vector = to_tsvector({LANGUAGE_CONFIG_SQL}, COALESCE(description, ''))",
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='acc_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='localizeaccommodation',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='localize_search_vector_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.3 on 2026-10-17 13:40
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Build the indexes without blocking writes to large tables
+    atomic = False
+
+    dependencies = [
+        ('polls', '0007_search_vectors'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='accommodation',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='gin_trgm_ops'), name='acc_title_trgm_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='accommodation',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='text_pattern_ops'), name='acc_title_prefix_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='location',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='gin_trgm_ops'), name='location_title_trgm_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='location',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('city'), name='gin_trgm_ops'), name='location_city_trgm_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='location',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='text_pattern_ops'), name='location_title_prefix_idx'),
+        ),
+    ]
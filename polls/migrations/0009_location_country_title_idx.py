@@ -0,0 +1,21 @@
+# Generated by Django 5.1.3 on 2026-10-17 14:20
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Build the index without blocking writes to a large table
+    atomic = False
+
+    dependencies = [
+        ('polls', '0008_title_trigram_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='location',
+            index=models.Index(fields=['country_code', 'title'], name='location_country_title_idx'),
+        ),
+    ]
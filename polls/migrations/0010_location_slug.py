@@ -0,0 +1,67 @@
+# Generated by Django 5.1.3 on 2026-10-17 15:05
+
+from itertools import count, islice
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+# Frozen copies of polls.slugs as of this migration, so later edits to the
+# app cannot change the slugs it backfills
+def slug_candidates(title, pk):
+    pk_slug = slugify(str(pk), allow_unicode=True)
+    base = slugify(title, allow_unicode=True)[:100].strip('-') or pk_slug
+    suffixed = f"{base}-{pk_slug}"
+    candidates = (base, suffixed, *(f"{suffixed}-{n}" for n in count(2)))
+    return list(islice(candidates, 3))
+
+
+def choose_slug(candidates, taken):
+    for candidate in candidates:
+        if candidate not in taken:
+            return candidate
+    return None
+
+
+def backfill_slugs(apps, schema_editor):
+    """
+    Assign slugs country by country in title order, so the first location
+    with a title gets the plain slug.
+    """
+    Location = apps.get_model('polls', 'Location')
+    taken = set()
+    country = None
+    batch = []
+    rows = Location.objects.order_by('country_code', 'title', 'id').values_list('id', 'country_code', 'title')
+    for pk, country_code, title in rows.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+        if country_code != country:
+            country, taken = country_code, set()
+        slug = choose_slug(slug_candidates(title, pk), taken) or pk
+        taken.add(slug)
+        batch.append(Location(id=pk, slug=slug))
+        if len(batch) >= BACKFILL_BATCH_SIZE:
+            Location.objects.bulk_update(batch, ['slug'])
+            batch = []
+    Location.objects.bulk_update(batch, ['slug'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0009_location_country_title_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='slug',
+            field=models.SlugField(allow_unicode=True, blank=True, db_index=False, editable=False, max_length=130),
+        ),
+        migrations.RunPython(backfill_slugs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='location',
+            constraint=models.UniqueConstraint(fields=('country_code', 'slug'), name='location_country_slug_uniq'),
+        ),
+    ]
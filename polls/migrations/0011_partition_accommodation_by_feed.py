@@ -0,0 +1,118 @@
+# Generated by Django 5.1.3 on 2026-10-17 15:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Per-feed partitions are named <table>_feed_<feed>, see polls/partitions.py
+
+
+def add_indexes_and_keys(Accommodation, schema_editor, primary_key):
+    """
+    Create the primary key, the foreign keys with their indexes, the spatial
+    index and the Meta indexes.
+    """
+    table = Accommodation._meta.db_table
+    quote = schema_editor.quote_name
+    execute = schema_editor.execute
+
+    execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(table + '_pkey')} PRIMARY KEY ({primary_key})")
+    # LIKE queries on the varchar key need a pattern_ops index
+    execute(f"CREATE INDEX {quote(table + '_id_like')} ON {quote(table)} (id varchar_pattern_ops)")
+    for field in Accommodation._meta.local_fields:
+        if not field.is_relation:
+            continue
+        column = field.column
+        execute(f"CREATE INDEX {quote(f'{table}_{column}_idx')} ON {quote(table)} ({quote(column)})")
+        if field.target_field.get_internal_type() == 'CharField':
+            execute(f"CREATE INDEX {quote(f'{table}_{column}_like')} ON {quote(table)} ({quote(column)} varchar_pattern_ops)")
+        execute(
+            f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(f'{table}_{column}_fk')} FOREIGN KEY ({quote(column)}) "
+            f"REFERENCES {quote(field.target_field.model._meta.db_table)} ({quote(field.target_field.column)}) "
+            f"DEFERRABLE INITIALLY DEFERRED"
+        )
+    # The GiST index PostGIS fields get by default (see 0001), named as Django names it
+    execute(f"CREATE INDEX {quote(table + '_center_id')} ON {quote(table)} USING GIST (center)")
+    for index in Accommodation._meta.indexes:
+        execute(index.create_sql(Accommodation, schema_editor))
+
+
+def partition_accommodation(apps, schema_editor):
+    """
+    Rebuild polls_accommodation as a table LIST-partitioned on `feed`.
+
+    A partitioned table's primary key must include the partition key, so the
+    key becomes (id, feed). Existing feeds get a partition each, and a default
+    partition catches feeds without one. Indexes and foreign keys are recreated
+    after the rows are copied.
+    """
+    Accommodation = apps.get_model('polls', 'Accommodation')
+    table = Accommodation._meta.db_table
+    old = f"{table}_unpartitioned"
+    quote = schema_editor.quote_name
+    execute = schema_editor.execute
+
+    execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(old)}")
+    execute(
+        f"CREATE TABLE {quote(table)} (LIKE {quote(old)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE) "
+        f"PARTITION BY LIST (feed)"
+    )
+    execute(f"CREATE TABLE {quote(table + '_default')} PARTITION OF {quote(table)} DEFAULT")
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"SELECT DISTINCT feed FROM {quote(old)} ORDER BY feed")
+        feeds = [feed for feed, in cursor.fetchall()]
+    for feed in feeds:
+        execute(f"CREATE TABLE {quote(f'{table}_feed_{feed}')} PARTITION OF {quote(table)} FOR VALUES IN ({int(feed)})")
+    execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(old)}")
+    execute(f"DROP TABLE {quote(old)}")
+    add_indexes_and_keys(Accommodation, schema_editor, 'id, feed')
+
+
+def unpartition_accommodation(apps, schema_editor):
+    """
+    Turn polls_accommodation back into a plain table keyed on `id`.
+
+    Fails on the primary key if an id has been loaded into two feeds.
+    """
+    Accommodation = apps.get_model('polls', 'Accommodation')
+    table = Accommodation._meta.db_table
+    partitioned = f"{table}_partitioned"
+    quote = schema_editor.quote_name
+    execute = schema_editor.execute
+
+    execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(partitioned)}")
+    execute(
+        f"CREATE TABLE {quote(table)} "
+        f"(LIKE {quote(partitioned)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE)"
+    )
+    execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(partitioned)}")
+    # Drops every partition along with the parent
+    execute(f"DROP TABLE {quote(partitioned)} CASCADE")
+    add_indexes_and_keys(Accommodation, schema_editor, 'id')
+    execute(f"CREATE INDEX {quote('polls_accom_feed_59a5cf_idx')} ON {quote(table)} (feed)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0010_location_slug'),
+    ]
+
+    operations = [
+        # Localizations can no longer reference accommodations by id alone,
+        # which is not unique on its own in a partitioned table
+        migrations.AlterField(
+            model_name='localizeaccommodation',
+            name='property_id',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='localized_versions', to='polls.accommodation'),
+        ),
+        # The partitions replace the plain index on feed
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveIndex(
+                    model_name='accommodation',
+                    name='polls_accom_feed_59a5cf_idx',
+                ),
+            ],
+        ),
+        migrations.RunPython(partition_accommodation, unpartition_accommodation, elidable=False),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.3 on 2026-10-17 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0011_partition_accommodation_by_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheGeneration',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('token', models.CharField(max_length=32)),
+                ('started_at', models.DateTimeField()),
+            ],
+        ),
+    ]
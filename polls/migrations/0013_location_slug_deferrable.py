@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-17 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0012_cachegeneration'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='location',
+            name='location_country_slug_uniq',
+        ),
+        migrations.AddConstraint(
+            model_name='location',
+            constraint=models.UniqueConstraint(
+                deferrable=models.Deferrable['DEFERRED'], fields=('country_code', 'slug'), name='location_country_slug_uniq',
+            ),
+        ),
+    ]
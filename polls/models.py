@@ -3,10 +3,16 @@ from django.db import models
 # Create your models here.
 from django.contrib.gis.db import models
 from django.contrib.auth.models import User
-
-
-from langdetect import detect, LangDetectException
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr, Upper
+
+from .language import validate_localization
+from .search import DEFAULT_SEARCH_CONFIG, search_config
+from .slugs import SLUG_MAX_LENGTH, choose_slug, slug_candidates
 
 class Location(models.Model):
     id = models.CharField(max_length=20, primary_key=True)
@@ -19,11 +25,130 @@ class Location(models.Model):
     city = models.CharField(max_length=30)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Materialized path of ids from the root, e.g. "/11/12/", kept in sync on save
+    path = models.TextField(default='', editable=False)
+    depth = models.PositiveIntegerField(default=0, editable=False)
+    # URL slug of the title, unique within the country (see polls/slugs.py)
+    slug = models.SlugField(max_length=SLUG_MAX_LENGTH, allow_unicode=True, blank=True, editable=False, db_index=False)
 
     def __str__(self):
         return self.title
 
+    class Meta:
+        constraints = [
+            # Also the index behind /places/<country>/<slug>/. Deferred, so an
+            # import can swap slugs between two locations in one statement
+            models.UniqueConstraint(
+                fields=['country_code', 'slug'], name='location_country_slug_uniq', deferrable=models.Deferrable.DEFERRED,
+            ),
+        ]
+        indexes = [
+            # text_pattern_ops lets `path LIKE '/11/%'` descendant queries use the index
+            models.Index(fields=['path'], name='polls_location_path_idx', opclasses=['text_pattern_ops']),
+            # Admin and autocomplete search, see polls/search.py
+            GinIndex(OpClass(Upper('title'), name='gin_trgm_ops'), name='location_title_trgm_idx'),
+            GinIndex(OpClass(Upper('city'), name='gin_trgm_ops'), name='location_city_trgm_idx'),
+            models.Index(OpClass(Upper('title'), name='text_pattern_ops'), name='location_title_prefix_idx'),
+            # Sitemap generation reads locations country by country in title order
+            models.Index(fields=['country_code', 'title'], name='location_country_title_idx'),
+        ]
+
+    def parent_path(self):
+        """
+        Return the stored (path, depth) of the parent, or None for a root.
+        """
+        if self.parent_id_id is None:
+            return None
+        return Location.objects.filter(pk=self.parent_id_id).values_list('path', 'depth').first()
+
+    def build_path(self, parent=None):
+        """
+        Return the (path, depth) this location should have under its current parent.
 
+        `parent` is the parent's (path, depth), if already loaded.
+        """
+        if self.parent_id_id is None:
+            return f"/{self.id}/", 0
+        parent_path, parent_depth = parent or Location.objects.values_list('path', 'depth').get(pk=self.parent_id_id)
+        return f"{parent_path}{self.id}/", parent_depth + 1
+
+    def assign_slug(self):
+        """
+        Set `slug` to the first candidate not used by another location in the same country.
+        """
+        candidates = slug_candidates(self.title, self.pk)
+        taken = set(
+            Location.objects.filter(country_code=self.country_code, slug__in=candidates)
+            .exclude(pk=self.pk).values_list('slug', flat=True)
+        )
+        slug = choose_slug(candidates, taken, self.slug)
+        if slug is None:
+            raise ValidationError({'title': "No unique slug is available for this title."})
+        self.slug = slug
+
+    def check_parent(self, parent):
+        """
+        Raise ValidationError if `parent` ((path, depth) of the parent) lies under this location.
+        """
+        if parent and self.pk is not None and f"/{self.pk}/" in parent[0]:
+            raise ValidationError({'parent_id': "A location cannot be its own ancestor."})
+
+    def clean(self):
+        """
+        Prevent a location from being moved under itself or one of its descendants.
+        """
+        self.check_parent(self.parent_path())
+
+    def save(self, *args, **kwargs):
+        """
+        Keep `slug`, `path` and `depth` current, moving the whole subtree when the parent changes.
+
+        The stored row and the parent are read once each; the slug is only
+        recomputed when the title or country changes.
+        """
+        old = Location.objects.filter(pk=self.pk).values_list(
+            'path', 'depth', 'parent_id', 'title', 'country_code', 'slug').first()
+        parent = self.parent_path()
+        self.check_parent(parent)
+        # Read by the cache invalidation signal, so the page the location leaves is refreshed too
+        self._stored_parent_id = old[2] if old else None
+        if old is None or not old[5] or (old[3], old[4]) != (self.title, self.country_code):
+            self.assign_slug()
+        else:
+            self.slug = old[5]
+        self.path, self.depth = self.build_path(parent)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'path', 'depth', 'slug'}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            if old and old[0] and old[:2] != (self.path, self.depth):
+                old_path, old_depth = old[:2]
+                Location.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                    path=Concat(Value(self.path), Substr('path', len(old_path) + 1), output_field=models.TextField()),
+                    depth=F('depth') + (self.depth - old_depth),
+                )
+
+    def get_descendants(self, max_depth=None):
+        """
+        Return all locations below this one, optionally at most `max_depth` levels down.
+        """
+        if not self.path:
+            # Not indexed yet (or caught in a parent cycle): an empty prefix would match every row
+            return Location.objects.none()
+        descendants = Location.objects.filter(path__startswith=self.path, depth__gt=self.depth)
+        if max_depth is not None:
+            descendants = descendants.filter(depth__lte=self.depth + max_depth)
+        return descendants
+
+    def get_ancestors(self):
+        """
+        Return the locations above this one, root first.
+        """
+        ancestor_ids = self.path.strip('/').split('/')[:-1]
+        return Location.objects.filter(pk__in=ancestor_ids).order_by('depth')
 
 
 class Accommodation(models.Model):
@@ -42,23 +167,74 @@ class Accommodation(models.Model):
     published = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False)  # Full-text index of `title`
 
     def __str__(self):
         return self.title
 
-    #for partition
+    def save(self, *args, **kwargs):
+        """
+        Refresh the stored search vector along with the row.
+
+        Runs in a transaction, so the facet signal's lock on the stored row
+        (see polls/signals.py) is held until the save commits.
+        """
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            Accommodation.objects.filter(pk=self.pk).update(
+                search_vector=SearchVector('title', config=DEFAULT_SEARCH_CONFIG)
+            )
+
+    # The table is LIST-partitioned on feed with primary key (id, feed); see
+    # migration 0011 and polls/partitions.py. The ORM still treats `id` as the
+    # key, so feed ingests and partition swaps reject ids of another feed.
     class Meta:
         indexes = [
-            models.Index(fields=['feed']),  # Index for feed partitioning
+            # Search filters and sorts (see polls/filters.py); the trailing id serves keyset pagination
+            models.Index(fields=['country_code', 'usd_rate', 'id'], name='acc_pub_country_rate_idx', condition=models.Q(published=True)),
+            models.Index(fields=['country_code', 'review_score', 'id'], name='acc_pub_country_score_idx', condition=models.Q(published=True)),
+            models.Index(fields=['country_code', 'bedroom_count', 'id'], name='acc_pub_country_beds_idx', condition=models.Q(published=True)),
+            models.Index(fields=['usd_rate', 'id'], name='acc_pub_rate_idx', condition=models.Q(published=True)),
+            models.Index(fields=['location_id', 'usd_rate'], name='acc_location_rate_idx'),
+            GinIndex(fields=['search_vector'], name='acc_search_vector_idx'),
+            GinIndex(OpClass(Upper('title'), name='gin_trgm_ops'), name='acc_title_trgm_idx'),
+            models.Index(OpClass(Upper('title'), name='text_pattern_ops'), name='acc_title_prefix_idx'),
+        ]
+
+
+class AccommodationFacet(models.Model):
+    """
+    Accommodation counts per facet combination, kept current by polls/signals.py.
+    See polls/facets.py for the bedroom buckets and price bands.
+    """
+    country_code = models.CharField(max_length=2)
+    published = models.BooleanField()
+    bedroom_bucket = models.PositiveSmallIntegerField()
+    price_band = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.country_code} {self.bedroom_bucket}/{self.price_band}: {self.count}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['country_code', 'published', 'bedroom_bucket', 'price_band'],
+                name='accommodation_facet_unique',
+            ),
         ]
 
 
 class LocalizeAccommodation(models.Model):
     id = models.BigAutoField(primary_key=True)  # Auto-incrementing primary key
-    property_id = models.ForeignKey(Accommodation, on_delete=models.CASCADE, related_name="localized_versions")
+    # No database constraint: partitioned accommodations are unique only on (id, feed).
+    # Deletes still cascade through the ORM, and partition swaps remove orphans.
+    property_id = models.ForeignKey(Accommodation, on_delete=models.CASCADE, related_name="localized_versions", db_constraint=False)
     language = models.CharField(max_length=2)  # Language code
     description = models.TextField()  # Localized description
     policy = models.JSONField()  # JSONB dictionary for localized policies
+    updated_at = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False)  # `description`, stemmed for `language`
 
     def __str__(self):
         return f"{self.language.upper()} - {self.property_id.title}"
@@ -67,37 +243,14 @@ class LocalizeAccommodation(models.Model):
         unique_together = ('property_id', 'language')  # Ensure unique language per accommodation
         indexes = [
             models.Index(fields=['language']),
+            GinIndex(fields=['search_vector'], name='localize_search_vector_idx'),
         ]
 
     def clean(self):
         """
         Validate that the `description` and `policy` fields are in the selected language.
         """
-        # Validate `description`
-        try:
-            detected_lang = detect(self.description)
-            if detected_lang != self.language:
-                raise ValidationError({
-                    'description': f"The description must be written in {self.language.upper()}."
-                })
-        except LangDetectException:
-            raise ValidationError({'description': "Language detection failed. Please ensure the text is valid."})
-
-        # Validate `policy` field values
-        if isinstance(self.policy, dict):
-            for key, value in self.policy.items():
-                try:
-                    detected_lang = detect(value)
-                    if detected_lang != self.language:
-                        raise ValidationError({
-                            'policy': f"Policy value for '{key}' must be written in {self.language.upper()}."
-                        })
-                except LangDetectException:
-                    raise ValidationError({
-                        'policy': f"Language detection failed for policy value '{key}'. Please ensure the text is valid."
-                    })
-        else:
-            raise ValidationError({'policy': "Policy must be a valid JSON object."})
+        validate_localization(self)
 
     def save(self, *args, **kwargs):
         """
@@ -105,5 +258,63 @@ class LocalizeAccommodation(models.Model):
         """
         self.clean()
         super().save(*args, **kwargs)
+        LocalizeAccommodation.objects.filter(pk=self.pk).update(
+            search_vector=SearchVector('description', config=search_config(self.language))
+        )
 
 
+
+
+class LocationImportJob(models.Model):
+    """
+    A location CSV upload processed in the background by `run_location_imports`.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    csv_file = models.FileField(upload_to='location_imports/')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    processed_rows = models.PositiveIntegerField(default=0)  # Rows covered by the last committed chunk
+    skipped_rows = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)  # Capped sample of [row, message] pairs
+    message = models.TextField(blank=True)  # Fatal error, if the job failed
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Import #{self.pk} ({self.status})"
+
+    @property
+    def imported_rows(self):
+        return self.processed_rows - self.skipped_rows
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+
+class CacheGeneration(models.Model):
+    """
+    The current token of a response cache generation, see polls/caching.py.
+
+    Kept in the database rather than the cache backend so that every web
+    worker and management command sees the same generations.
+    """
+    name = models.CharField(max_length=100, primary_key=True)  # e.g. "accommodations:US"
+    token = models.CharField(max_length=32)
+    started_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name}: {self.token}"
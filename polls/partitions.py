@@ -0,0 +1,271 @@
+from django.db import connection, transaction
+from django.utils import timezone
+from .caching import accommodation_generations, bump_generations
+from .facets import rebuild_facets
+from .models import Accommodation, LocalizeAccommodation
+from .search import DEFAULT_SEARCH_CONFIG
+
+# polls_accommodation is LIST-partitioned on `feed` (see migration 0011).
+# Each feed has its own partition; rows of feeds without one land in the
+# default partition. The primary key is (id, feed), but the ORM and
+# localizations address accommodations by id alone, so an id must not appear
+# in two feeds: loaded tables are checked before they are attached.
+PARENT_TABLE = Accommodation._meta.db_table
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+
+
+def quote(name):
+    return connection.ops.quote_name(name)
+
+
+def partition_name(feed):
+    return f"{PARENT_TABLE}_feed_{int(feed)}"
+
+
+def staging_name(feed):
+    return f"{PARENT_TABLE}_feed_{int(feed)}_staging"
+
+
+def list_partitions():
+    """
+    Return (table name, partition bound, approximate row count) for every partition.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid), child.reltuples::bigint
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            ORDER BY child.relname
+        """, [PARENT_TABLE])
+        return cursor.fetchall()
+
+
+def table_exists(name):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [name])
+        return cursor.fetchone()[0]
+
+
+def is_partition(name):
+    return any(table == name for table, _, _ in list_partitions())
+
+
+def create_partition(feed):
+    """
+    Create the partition of a feed, moving any of its rows out of the default partition.
+
+    The default partition is detached while the rows move, since PostgreSQL
+    refuses to create a partition whose rows already sit in the default one.
+    """
+    feed = int(feed)
+    name = partition_name(feed)
+    if is_partition(name):
+        return False
+    parent, default, table = quote(PARENT_TABLE), quote(DEFAULT_PARTITION), quote(name)
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Tables with pending deferred foreign key checks cannot be altered
+        connection.check_constraints()
+        cursor.execute(f"ALTER TABLE {parent} DETACH PARTITION {default}")
+        cursor.execute(f"CREATE TABLE {table} PARTITION OF {parent} FOR VALUES IN ({feed})")
+        cursor.execute(f"""
+            WITH moved AS (DELETE FROM {default} WHERE feed = %s RETURNING *)
+            INSERT INTO {table} SELECT * FROM moved
+        """, [feed])
+        connection.check_constraints()
+        cursor.execute(f"ALTER TABLE {parent} ATTACH PARTITION {default} DEFAULT")
+    return True
+
+
+def create_staging(feed):
+    """
+    Create an empty table shaped like a partition of `feed`, ready to be loaded.
+
+    It copies the parent's columns, defaults, constraints and indexes, plus a
+    CHECK on `feed` that lets ATTACH PARTITION skip its validation scan.
+    """
+    feed = int(feed)
+    table = quote(staging_name(feed))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {table} (LIKE {quote(PARENT_TABLE)} INCLUDING ALL)")
+        cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {quote(staging_name(feed) + '_feed_check')} "
+                       f"CHECK (feed IS NOT NULL AND feed = {feed})")
+    return staging_name(feed)
+
+
+def attach_partition(table, feed):
+    """
+    Attach a loaded table as the partition of `feed`.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {quote(PARENT_TABLE)} ATTACH PARTITION {quote(table)} FOR VALUES IN ({int(feed)})")
+
+
+def detach_partition(feed, concurrently=False):
+    """
+    Detach the partition of `feed`, leaving it as a standalone table.
+
+    With `concurrently`, readers and writers of other feeds are not blocked;
+    this cannot run inside a transaction.
+    """
+    option = ' CONCURRENTLY' if concurrently else ''
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {quote(PARENT_TABLE)} DETACH PARTITION {quote(partition_name(feed))}{option}")
+
+
+def add_foreign_keys(table):
+    """
+    Add and validate the parent's foreign keys on a loaded staging table.
+
+    ATTACH PARTITION reuses equivalent constraints instead of validating them
+    while it holds its lock, so this moves the check out of the swap.
+    """
+    with connection.cursor() as cursor:
+        for field in Accommodation._meta.concrete_fields:
+            if not field.is_relation or not field.db_constraint:
+                continue
+            cursor.execute(
+                f"ALTER TABLE {quote(table)} ADD FOREIGN KEY ({quote(field.column)}) "
+                f"REFERENCES {quote(field.target_field.model._meta.db_table)} ({quote(field.target_field.column)}) "
+                f"{connection.ops.deferrable_sql().strip()}"
+            )
+
+
+def ids_in_other_feeds(table, feed, limit=10):
+    """
+    Return up to `limit` ids of `table` that already belong to an accommodation of another feed.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT loaded.id FROM {quote(table)} AS loaded
+            WHERE EXISTS (SELECT 1 FROM {quote(PARENT_TABLE)} AS a WHERE a.id = loaded.id AND a.feed <> %s)
+            ORDER BY loaded.id
+            LIMIT %s
+        """, [int(feed), limit])
+        return [accommodation_id for accommodation_id, in cursor.fetchall()]
+
+
+def fill_search_vectors(table):
+    """
+    Compute the title search vector of loaded rows that have none, as Accommodation.save() would.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {quote(table)} SET search_vector = to_tsvector(%s, title) WHERE search_vector IS NULL",
+            [DEFAULT_SEARCH_CONFIG],
+        )
+
+
+def prepare_table(table, feed):
+    """
+    Get a loaded table ready to become the partition of `feed`.
+
+    Raises ValueError if some of its ids already belong to another feed.
+    """
+    duplicates = ids_in_other_feeds(table, feed)
+    if duplicates:
+        raise ValueError(f"{table} has ids that already belong to another feed: {', '.join(duplicates)}")
+    fill_search_vectors(table)
+
+
+def drop_table(table):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE {quote(table)}")
+
+
+def delete_localizations(table, except_table=None):
+    """
+    Delete localizations of the accommodations in `table`, except those also in `except_table`.
+    """
+    localizations = quote(LocalizeAccommodation._meta.db_table)
+    property_column = quote(LocalizeAccommodation._meta.get_field('property_id').column)
+    ids = f"SELECT id FROM {quote(table)}"
+    if except_table:
+        ids += f" EXCEPT SELECT id FROM {quote(except_table)}"
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {localizations} WHERE {property_column} IN ({ids})")
+
+
+def refresh_derived_data(tables):
+    """
+    Bring facet counts and cached responses up to date after partitions were
+    swapped underneath the ORM, which bypasses model signals.
+    """
+    countries = set()
+    with connection.cursor() as cursor:
+        for table in tables:
+            cursor.execute(f"SELECT DISTINCT country_code FROM {quote(table)}")
+            countries.update(country_code for country_code, in cursor.fetchall())
+    rebuild_facets()
+    bump_generations(accommodation_generations(*countries))
+
+
+def exclude_from_default(feed):
+    """
+    Add a validated CHECK to the default partition ruling out `feed`, and return its name.
+
+    With it, attaching the feed's partition skips the scan of the default
+    partition. VALIDATE only takes a SHARE UPDATE EXCLUSIVE lock, so the
+    scan happens here without blocking reads or writes.
+    """
+    constraint = f"{DEFAULT_PARTITION}_not_feed_{int(feed)}"
+    connection.check_constraints()
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {quote(DEFAULT_PARTITION)} DROP CONSTRAINT IF EXISTS {quote(constraint)}")
+        cursor.execute(f"ALTER TABLE {quote(DEFAULT_PARTITION)} ADD CONSTRAINT {quote(constraint)} "
+                       f"CHECK (feed IS DISTINCT FROM {int(feed)}) NOT VALID")
+        cursor.execute(f"ALTER TABLE {quote(DEFAULT_PARTITION)} VALIDATE CONSTRAINT {quote(constraint)}")
+    return constraint
+
+
+def drop_constraint(table, constraint):
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {quote(table)} DROP CONSTRAINT IF EXISTS {quote(constraint)}")
+
+
+def swap_partition(feed, staging_table, keep_old=False):
+    """
+    Replace the partition of `feed` with a loaded staging table in one short transaction.
+
+    Everything that scans a table runs outside that transaction:
+    - Before it, the staging table is checked for ids of other feeds and
+      given search vectors, foreign keys are validated on it, the feed's
+      partition is created if needed, and a CHECK on the default partition
+      lets ATTACH skip its scan.
+    - Inside it, the current partition is detached and renamed, and the
+      staging table takes its name and is attached. Readers are blocked only
+      for these catalog changes.
+    - Once it commits, localizations of accommodations missing from the new
+      data are deleted (their foreign key is not enforced by the database),
+      facet counts and cached responses are refreshed, and the old table is
+      dropped unless `keep_old` is set.
+
+    Returns the name of the kept table, or None.
+    """
+    feed = int(feed)
+    name = partition_name(feed)
+    old_name = f"{name}_old_{timezone.now():%Y%m%d%H%M%S}"
+
+    prepare_table(staging_table, feed)
+    add_foreign_keys(staging_table)
+    create_partition(feed)
+    constraint = exclude_from_default(feed)
+    with transaction.atomic():
+        # Tables with pending deferred foreign key checks cannot be altered
+        connection.check_constraints()
+        detach_partition(feed)
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {quote(name)} RENAME TO {quote(old_name)}")
+            cursor.execute(f"ALTER TABLE {quote(staging_table)} RENAME TO {quote(name)}")
+        attach_partition(name, feed)
+
+        def clean_up():
+            drop_constraint(DEFAULT_PARTITION, constraint)
+            delete_localizations(old_name, except_table=name)
+            refresh_derived_data([old_name, name])
+            if not keep_old:
+                drop_table(old_name)
+
+        transaction.on_commit(clean_up)
+    return old_name if keep_old else None
@@ -0,0 +1,73 @@
+from functools import reduce
+from operator import or_
+from django.contrib.postgres.search import SearchQuery
+from django.db.models import Q
+from django.db.models.functions import Upper
+
+# PostgreSQL text search configurations for our two-letter language codes.
+# Languages without a stemmer (e.g. 'bn') fall back to 'simple'.
+SEARCH_CONFIGS = {
+    'da': 'danish',
+    'de': 'german',
+    'en': 'english',
+    'es': 'spanish',
+    'fi': 'finnish',
+    'fr': 'french',
+    'hu': 'hungarian',
+    'it': 'italian',
+    'nl': 'dutch',
+    'no': 'norwegian',
+    'pt': 'portuguese',
+    'ro': 'romanian',
+    'ru': 'russian',
+    'sv': 'swedish',
+    'tr': 'turkish',
+}
+DEFAULT_SEARCH_CONFIG = 'simple'
+
+# pg_trgm cannot use its index for patterns shorter than a trigram, so
+# shorter terms are matched as prefixes through a text_pattern_ops index
+TRIGRAM_MIN_LENGTH = 3
+AUTOCOMPLETE_LIMIT = 20
+
+
+def search_config(language):
+    return SEARCH_CONFIGS.get((language or '').lower(), DEFAULT_SEARCH_CONFIG)
+
+
+def search_query(text, language=None):
+    """
+    Build a websearch-style query for `text`.
+
+    Vectors are stemmed with their row's language, so without a language the
+    query is parsed with every configuration and the results OR'ed together.
+    """
+    if language:
+        return SearchQuery(text, search_type='websearch', config=search_config(language))
+    configs = sorted(set(SEARCH_CONFIGS.values()) | {DEFAULT_SEARCH_CONFIG})
+    return reduce(or_, (SearchQuery(text, search_type='websearch', config=config) for config in configs))
+
+
+def title_match(field, term):
+    """
+    Return a Q matching `term` anywhere in `field`, or at its start for short terms.
+
+    Both forms compare UPPER(field) so they can use the `gin_trgm_ops` and
+    `text_pattern_ops` expression indexes on the model.
+    """
+    if len(term) < TRIGRAM_MIN_LENGTH:
+        return Q(**{f'{field}__istartswith': term})
+    return Q(**{f'{field}__icontains': term})
+
+
+def autocomplete(queryset, term, field='title', limit=AUTOCOMPLETE_LIMIT):
+    """
+    Return at most `limit` rows whose `field` matches `term`, ordered by `field`.
+
+    Rows are ordered case-insensitively on UPPER(`field`), the expression the
+    prefix and trigram indexes are built on.
+    """
+    term = term.strip()
+    if term:
+        queryset = queryset.filter(title_match(field, term))
+    return queryset.order_by(Upper(field), 'pk')[:limit]
@@ -0,0 +1,75 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .caching import accommodation_generations, bump_generations, location_generations
+from .facets import bump_facets, facet_key
+from .models import Accommodation, LocalizeAccommodation, Location
+
+
+@receiver(pre_save, sender=Accommodation)
+def remember_facet_key(sender, instance, raw=False, **kwargs):
+    """
+    Record which facet row the stored version of the accommodation counted towards.
+
+    The stored row is locked until the save commits, so concurrent saves of
+    the same accommodation cannot both move it out of the same facet.
+    """
+    if raw:
+        return
+    stored = Accommodation.objects.select_for_update().filter(pk=instance.pk).values(
+        'country_code', 'published', 'bedroom_count', 'usd_rate').first()
+    instance._stored_facet_key = facet_key(Accommodation(**stored)) if stored else None
+
+
+@receiver(post_save, sender=Accommodation)
+def update_facets_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old_key = getattr(instance, '_stored_facet_key', None)
+    new_key = facet_key(instance)
+    if old_key == new_key:
+        return
+    deltas = {new_key: 1}
+    if old_key is not None:
+        deltas[old_key] = -1
+    bump_facets(deltas)
+
+
+@receiver(post_delete, sender=Accommodation)
+def update_facets_on_delete(sender, instance, **kwargs):
+    bump_facets({facet_key(instance): -1})
+
+
+@receiver(post_save, sender=Accommodation)
+def invalidate_accommodation_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # The stored facet key starts with the country the accommodation may be leaving
+    old_key = getattr(instance, '_stored_facet_key', None)
+    bump_generations(accommodation_generations(instance.country_code, old_key and old_key[0]))
+
+
+@receiver(post_delete, sender=Accommodation)
+def invalidate_accommodation_on_delete(sender, instance, **kwargs):
+    bump_generations(accommodation_generations(instance.country_code))
+
+
+@receiver(post_save, sender=LocalizeAccommodation)
+@receiver(post_delete, sender=LocalizeAccommodation)
+def invalidate_localized_accommodation(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    country_code = Accommodation.objects.filter(pk=instance.property_id_id).values_list('country_code', flat=True).first()
+    bump_generations(accommodation_generations(country_code))
+
+
+@receiver(post_save, sender=Location)
+def invalidate_location_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    bump_generations(location_generations(
+        instance.pk, instance.parent_id_id, getattr(instance, '_stored_parent_id', None)))
+
+
+@receiver(post_delete, sender=Location)
+def invalidate_location_on_delete(sender, instance, **kwargs):
+    bump_generations(location_generations(instance.pk, instance.parent_id_id))
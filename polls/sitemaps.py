@@ -0,0 +1,283 @@
+import gzip
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import groupby
+from operator import itemgetter
+from xml.sax.saxutils import escape
+from django.db import connections
+from django.db.models import Count, Max
+from django.urls import reverse
+from .models import Location
+
+# Rows fetched per round trip from the server-side cursor
+SITEMAP_CHUNK_SIZE = 5000
+
+# Limits of a single sitemap file in the sitemaps.org protocol
+SITEMAP_MAX_URLS = 50000
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024  # Uncompressed
+
+SITEMAP_XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def location_url(country_code, slug):
+    """
+    Return the sitemap.json entry of a location from its stored slug, e.g. "us/san-francisco".
+    """
+    return f"{country_code.lower()}/{slug}"
+
+
+def location_path(country_code, slug):
+    """
+    Return the percent-encoded path of a location's page, as routed by the URLconf.
+    """
+    return reverse('location_by_slug', kwargs={'country': country_code.lower(), 'slug': slug})
+
+
+@contextmanager
+def atomic_write(path, mode='w'):
+    """
+    Write to a temporary file next to `path` and rename it into place on success,
+    so readers never see a partly written file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def location_rows(country_code=None, chunk_size=SITEMAP_CHUNK_SIZE):
+    """
+    Yield (country_code, title, slug) tuples ordered by country then title,
+    reading only those columns through a server-side cursor.
+    """
+    locations = Location.objects.all()
+    if country_code is not None:
+        locations = locations.filter(country_code=country_code)
+    return locations.order_by('country_code', 'title').values_list('country_code', 'title', 'slug').iterator(chunk_size=chunk_size)
+
+
+def write_country(f, country_code, locations):
+    """
+    Write one country entry of sitemap.json from (title, slug) pairs, one location per line.
+    """
+    f.write('    {"country": %s, "name": %s, "locations": [' % (json.dumps(country_code), json.dumps(country_code)))
+    separator = '\n'
+    for title, slug in locations:
+        f.write(separator + '        ' + json.dumps({title: location_url(country_code, slug)}))
+        separator = ',\n'
+    f.write('\n    ]}')
+
+
+def write_sitemap(path, chunk_size=SITEMAP_CHUNK_SIZE):
+    """
+    Stream every location into a sitemap.json file in a single ordered pass.
+
+    Memory use is bounded by `chunk_size`. Returns the number of countries written.
+    """
+    countries = 0
+    with atomic_write(path) as f:
+        f.write('[')
+        for country_code, rows in groupby(location_rows(chunk_size=chunk_size), key=itemgetter(0)):
+            f.write(',\n' if countries else '\n')
+            write_country(f, country_code, (row[1:] for row in rows))
+            countries += 1
+        f.write('\n]\n')
+    return countries
+
+
+def country_state():
+    """
+    Return {country code: [location count, latest updated_at]} from one grouped query.
+
+    A country whose entry differs from the previous run has had a location
+    added, changed or removed since then.
+    """
+    rows = Location.objects.values('country_code').annotate(count=Count('id'), last_updated=Max('updated_at'))
+    return {row['country_code']: [row['count'], row['last_updated'].isoformat()] for row in rows}
+
+
+def load_state(state_path):
+    try:
+        with open(state_path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def fragment_path(fragments_dir, country_code):
+    return os.path.join(fragments_dir, f"{country_code}.json")
+
+
+def write_incremental_sitemap(path, fragments_dir, state_path, chunk_size=SITEMAP_CHUNK_SIZE):
+    """
+    Regenerate only the countries that changed since the last run, then join
+    the per-country fragments into sitemap.json.
+
+    Each country's entry is kept as a fragment file in `fragments_dir`, and the
+    count and latest `updated_at` of every country are kept in `state_path`.
+    Returns (changed countries, removed countries).
+    """
+    previous = load_state(state_path)
+    current = country_state()
+
+    changed = sorted(
+        country_code for country_code, state in current.items()
+        if previous.get(country_code) != state or not os.path.exists(fragment_path(fragments_dir, country_code))
+    )
+    removed = sorted(set(previous) - set(current))
+
+    for country_code in changed:
+        with atomic_write(fragment_path(fragments_dir, country_code)) as f:
+            write_country(f, country_code, (row[1:] for row in location_rows(country_code, chunk_size)))
+    for country_code in removed:
+        if os.path.exists(fragment_path(fragments_dir, country_code)):
+            os.unlink(fragment_path(fragments_dir, country_code))
+
+    with atomic_write(path) as f:
+        f.write('[')
+        for index, country_code in enumerate(sorted(current)):
+            f.write(',\n' if index else '\n')
+            with open(fragment_path(fragments_dir, country_code)) as fragment:
+                for block in iter(lambda: fragment.read(1 << 16), ''):
+                    f.write(block)
+        f.write('\n]\n')
+
+    # Saved last, so an interrupted run is simply repeated next time
+    with atomic_write(state_path) as f:
+        json.dump(current, f)
+    return changed, removed
+
+
+def lastmod(timestamp):
+    return timestamp.replace(microsecond=0).isoformat()
+
+
+class ShardWriter:
+    """
+    Write <url> entries into gzipped sitemap files of one country, starting a
+    new shard whenever the URL or size limit would be exceeded.
+
+    Each shard is written to a temporary file and renamed into place once complete.
+    """
+    HEADER = f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_XMLNS}">\n'.encode('utf-8')
+    FOOTER = b'</urlset>\n'
+
+    def __init__(self, directory, country_code, max_urls):
+        self.directory = directory
+        self.country_code = country_code
+        self.max_urls = max_urls
+        self.shards = []  # [filename, latest updated_at]
+        self.file = None
+
+    def open(self):
+        filename = f"sitemap-{self.country_code.lower()}-{len(self.shards) + 1}.xml.gz"
+        fd, self.temp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        self.raw = os.fdopen(fd, 'wb')
+        # mtime=0 keeps unchanged shards byte-identical between runs
+        self.file = gzip.GzipFile(fileobj=self.raw, mode='wb', mtime=0)
+        self.file.write(self.HEADER)
+        self.urls = 0
+        self.size = len(self.HEADER) + len(self.FOOTER)
+        self.shards.append([filename, None])
+
+    def close(self):
+        if self.file is None:
+            return
+        self.file.write(self.FOOTER)
+        self.file.close()
+        self.raw.close()
+        os.chmod(self.temp_path, 0o644)
+        os.replace(self.temp_path, os.path.join(self.directory, self.shards[-1][0]))
+        self.file = None
+
+    def abort(self):
+        if self.file is None:
+            return
+        self.file.close()
+        self.raw.close()
+        os.unlink(self.temp_path)
+        self.file = None
+
+    def add(self, url, updated_at):
+        entry = f"<url><loc>{escape(url)}</loc><lastmod>{lastmod(updated_at)}</lastmod></url>\n".encode('utf-8')
+        if self.file is not None and (self.urls >= self.max_urls or self.size + len(entry) > SITEMAP_MAX_BYTES):
+            self.close()
+        if self.file is None:
+            self.open()
+        self.file.write(entry)
+        self.urls += 1
+        self.size += len(entry)
+        shard = self.shards[-1]
+        shard[1] = max(shard[1], updated_at) if shard[1] else updated_at
+
+
+def write_country_xml(country_code, directory, base_url, max_urls=SITEMAP_MAX_URLS, chunk_size=SITEMAP_CHUNK_SIZE):
+    """
+    Write the XML sitemap shards of one country.
+
+    Runs in a worker process. Returns a list of (filename, lastmod) pairs.
+    """
+    writer = ShardWriter(directory, country_code, max_urls)
+    rows = (
+        Location.objects.filter(country_code=country_code).order_by('title')
+        .values_list('slug', 'updated_at').iterator(chunk_size=chunk_size)
+    )
+    try:
+        for slug, updated_at in rows:
+            writer.add(f"{base_url}{location_path(country_code, slug)}", updated_at)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    return [(filename, lastmod(updated_at)) for filename, updated_at in writer.shards]
+
+
+def init_worker():
+    import django
+    django.setup()
+
+
+def write_xml_sitemaps(directory, base_url, shards_url, workers=None, max_urls=SITEMAP_MAX_URLS, chunk_size=SITEMAP_CHUNK_SIZE):
+    """
+    Render the XML sitemap shards of every country, in parallel processes,
+    and write a sitemap.xml index listing them.
+
+    Shards no longer listed in the index are removed afterwards. Returns the
+    number of shards written.
+    """
+    base_url = base_url.rstrip('/')
+    shards_url = shards_url.rstrip('/')
+    countries = list(Location.objects.order_by('country_code').values_list('country_code', flat=True).distinct())
+    os.makedirs(directory, exist_ok=True)
+    arguments = [(country_code, directory, base_url, max_urls, chunk_size) for country_code in countries]
+
+    if workers == 1:
+        results = [write_country_xml(*args) for args in arguments]
+    else:
+        # Workers open their own connections; a forked copy of ours must not be shared
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+            results = list(pool.map(write_country_xml, *zip(*arguments))) if arguments else []
+
+    shards = [shard for country_shards in results for shard in country_shards]
+    with atomic_write(os.path.join(directory, 'sitemap.xml')) as f:
+        f.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_XMLNS}">\n')
+        for filename, modified in shards:
+            f.write(f"<sitemap><loc>{escape(shards_url)}/{filename}</loc><lastmod>{modified}</lastmod></sitemap>\n")
+        f.write('</sitemapindex>\n')
+
+    listed = {filename for filename, _ in shards}
+    for filename in os.listdir(directory):
+        if filename.startswith('sitemap-') and filename.endswith('.xml.gz') and filename not in listed:
+            os.unlink(os.path.join(directory, filename))
+    return len(shards)
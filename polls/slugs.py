@@ -0,0 +1,35 @@
+from itertools import count, islice
+from django.utils.text import slugify
+
+SLUG_MAX_LENGTH = 130
+
+# Candidate slugs tried per location before giving up
+SLUG_CANDIDATES = 3
+
+
+def slug_candidates(title, pk):
+    """
+    Return the slugs a location may use, in order of preference:
+    "san-francisco", then "san-francisco-<id>", then "san-francisco-<id>-2".
+    """
+    pk_slug = slugify(str(pk), allow_unicode=True)
+    # Titles without any letters or digits fall back to the id
+    base = slugify(title, allow_unicode=True)[:100].strip('-') or pk_slug
+    suffixed = f"{base}-{pk_slug}"
+    candidates = (base, suffixed, *(f"{suffixed}-{n}" for n in count(2)))
+    return list(islice(candidates, SLUG_CANDIDATES))
+
+
+def choose_slug(candidates, taken, current=None):
+    """
+    Return the first candidate not in `taken`, or None if all are taken.
+
+    The current slug is kept while it is still a free candidate, so slugs
+    (and URLs) stay stable when another location takes the preferred one.
+    """
+    if current in candidates and current not in taken:
+        return current
+    for candidate in candidates:
+        if candidate not in taken:
+            return candidate
+    return None
@@ -1,12 +1,28 @@
-from django.test import Client, TestCase
+from django.test import Client, SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User, Group
 from django.contrib.gis.geos import Point
-from .models import Location, Accommodation, LocalizeAccommodation
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from .models import Location, Accommodation, CacheGeneration, LocalizeAccommodation, LocationImportJob
+from .importers import import_locations, iter_csv_lines, run_import_job
+from .facets import facet_counts
+from .ingest import ingest_accommodations, read_feed
+from .pagination import encode_cursor
+from .partitions import create_partition, create_staging, list_partitions, partition_name, swap_partition
+from .language import check_localizations, clear_detection_cache, detect_languages, warm_up
 from unittest.mock import patch
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from datetime import timedelta
+import gzip
 import io
+import json
 import csv
+import os
+import tempfile
 
 
 class LocationModelTestCase(TestCase):
@@ -150,10 +166,26 @@ class AccommodationModelTestCase(TestCase):
         )
         self.assertEqual(str(accommodation), 'Test Accommodation')
 
+    def test_accommodation_facets_from_string_values(self):
+        # Field values given as strings count towards the facet row they are stored as
+        location = Location.objects.create(
+            id='123', title='Test Location', center=Point(10.0, 20.0), location_type='city',
+            country_code='US', state_abbr='CA', city='San Francisco',
+        )
+        Accommodation.objects.create(
+            id='456', title='Test Accommodation', country_code='US', bedroom_count='2', usd_rate='99.50',
+            center=Point(11.0, 21.0), images={}, location_id=location, amenities={}, published='0',
+        )
+        self.assertEqual(facet_counts(published=True)['countries'], [])
+        self.assertEqual(facet_counts(published=False)['price_bands'], [{'band': '50-100', 'count': 1}])
+
 
 
 class LocalizeAccommodationModelTestCase(TestCase):
     def setUp(self):
+        # Results cached by other tests (possibly mocked) must not leak in
+        clear_detection_cache()
+
         # Create a user for the accommodation
         self.user = User.objects.create_user(username='testuser', password='testpassword')
         
@@ -185,7 +217,7 @@ class LocalizeAccommodationModelTestCase(TestCase):
             published=True
         )
 
-    @patch('polls.models.detect', return_value='en')  # Mock language detection to return 'en'
+    @patch('polls.language.detect', return_value='en')  # Mock language detection to return 'en'
     def test_localize_accommodation_creation(self, mock_detect):
         # Test creating a new LocalizeAccommodation object
         localize_accommodation = LocalizeAccommodation.objects.create(
@@ -198,7 +230,7 @@ class LocalizeAccommodationModelTestCase(TestCase):
         self.assertEqual(localize_accommodation.description, 'This is a test description.')
         self.assertEqual(localize_accommodation.policy, {'check_in': 'Check-in at 3 PM', 'check_out': 'Check-out at 11 AM'})
 
-    @patch('polls.models.detect', return_value='en')  # Mock language detection to return 'en'
+    @patch('polls.language.detect', return_value='en')  # Mock language detection to return 'en'
     def test_localize_accommodation_update(self, mock_detect):
         # Test updating an existing LocalizeAccommodation object
         localize_accommodation = LocalizeAccommodation.objects.create(
@@ -227,10 +259,341 @@ class LocalizeAccommodationModelTestCase(TestCase):
         )
         self.assertEqual(str(localize_accommodation), 'EN - Test Accommodation')
 
+    @patch('polls.language.detect', return_value='en')
+    def test_localize_accommodation_detects_once_per_save(self, mock_detect):
+        # clean() and save() share one detection pass, and repeated policy text is detected once
+        localize_accommodation = LocalizeAccommodation(
+            property_id=self.accommodation,
+            language='en',
+            description='This is a test description.',
+            policy={'check_in': 'Flexible policy', 'check_out': 'Flexible policy'}
+        )
+        localize_accommodation.full_clean()
+        localize_accommodation.save()
+        self.assertEqual(mock_detect.call_count, 2)
+
+    @patch('polls.language.detect', return_value='fr')
+    def test_localize_accommodation_wrong_language(self, mock_detect):
+        # Text detected in another language is rejected
+        with self.assertRaises(ValidationError):
+            LocalizeAccommodation.objects.create(
+                property_id=self.accommodation,
+                language='en',
+                description='Une belle propriété.',
+                policy={'check_in': 'Arrivée à 15h'}
+            )
+
+    @patch('polls.language.detect', return_value='en')
+    def test_detect_languages_uses_cache(self, mock_detect):
+        # Cached texts are not detected again
+        self.assertEqual(detect_languages(['Cached text', 'Cached text']), ['en', 'en'])
+        self.assertEqual(detect_languages(['Cached text']), ['en'])
+        self.assertEqual(mock_detect.call_count, 1)
+
+
+
+class CSVStreamingTestCase(SimpleTestCase):
+    def test_iter_csv_lines_handles_split_chunks(self):
+        # Multi-byte characters and quoted newlines split across chunk boundaries
+        data = 'id,title\r\n1,"Dhá\r\nka"\r\n2,Ξ'.encode('utf-8')
+        chunks = [data[i:i + 3] for i in range(0, len(data), 3)]
+        rows = list(csv.DictReader(iter_csv_lines(chunks)))
+        self.assertEqual(rows, [{'id': '1', 'title': 'Dhá\r\nka'}, {'id': '2', 'title': 'Ξ'}])
+
+
+class LanguageWarmUpTestCase(SimpleTestCase):
+    def test_warm_up_loads_profiles(self):
+        # Profiles are loaded up front and the timing is reported
+        report = warm_up()
+        self.assertGreater(report['profiles'], 0)
+        self.assertGreaterEqual(report['milliseconds'], 0)
+
+
+class LocalizationRevalidationTestCase(SimpleTestCase):
+    def setUp(self):
+        clear_detection_cache()
+
+    @patch('polls.language.detect', side_effect=lambda text: 'bn' if text.startswith('BN') else 'en')
+    def test_check_localizations_reports_violations(self, mock_detect):
+        # Only rows whose text does not match their language are reported
+        violations = check_localizations([
+            (1, '456', 'en', 'EN description', {'check_in': 'EN policy'}),
+            (2, '456', 'en', 'BN description', {'check_in': 'EN policy'}),
+            (3, '457', 'en', 'EN description', 'not a dict'),
+        ])
+        self.assertEqual([violation['id'] for violation in violations], [2, 3])
+        self.assertIn('description', violations[0]['errors'])
+        self.assertIn('policy', violations[1]['errors'])
+
+
+class LocationPathTestCase(TestCase):
+    def create_location(self, location_id, parent=None):
+        return Location.objects.create(
+            id=location_id, title=f'Location {location_id}', center=Point(10.0, 20.0),
+            location_type='city', country_code='US', state_abbr='CA', city='San Jose', parent_id=parent
+        )
+
+    def test_path_follows_parent_changes(self):
+        # Moving a location moves its whole subtree
+        root = self.create_location('1')
+        child = self.create_location('2', root)
+        grandchild = self.create_location('3', child)
+        self.assertEqual(grandchild.path, '/1/2/3/')
+        self.assertEqual(grandchild.depth, 2)
+
+        other_root = self.create_location('9')
+        child.parent_id = other_root
+        child.save()
+        grandchild.refresh_from_db()
+        self.assertEqual(grandchild.path, '/9/2/3/')
+        self.assertEqual(list(grandchild.get_ancestors().values_list('id', flat=True)), ['9', '2'])
+        self.assertEqual(list(other_root.get_descendants().values_list('id', flat=True).order_by('id')), ['2', '3'])
+        self.assertEqual(list(other_root.get_descendants(max_depth=1).values_list('id', flat=True)), ['2'])
+
+    def test_location_cannot_be_its_own_ancestor(self):
+        root = self.create_location('1')
+        child = self.create_location('2', root)
+        root.parent_id = child
+        with self.assertRaises(ValidationError):
+            root.save()
+
+    def test_unindexed_location_has_no_descendants(self):
+        # An empty path would otherwise prefix-match every row
+        self.create_location('1')
+        unindexed = self.create_location('2')
+        Location.objects.filter(id='2').update(path='')
+        unindexed.refresh_from_db()
+        self.assertFalse(unindexed.get_descendants().exists())
+
+    def test_unindexed_location_rollup_lists_only_itself(self):
+        self.create_location('1')
+        self.create_location('2')
+        Location.objects.filter(id='2').update(path='')
+        response = self.client.get(reverse('location_rollup', args=['2']))
+        self.assertEqual([row['id'] for row in response.json()['locations']], ['2'])
+
+
+class LocationHierarchyImportTestCase(TestCase):
+    def location_row(self, location_id, parent_id):
+        return {
+            'id': location_id, 'title': f'Location {location_id}', 'center': 'POINT(10.0 20.0)',
+            'location_type': 'city', 'country_code': 'US', 'state_abbr': 'CA', 'city': 'San Jose',
+            'parent_id': parent_id,
+        }
+
+    def test_import_resolves_parents_in_bulk(self):
+        # Children may come before their parents; dangling parents and cycles are reported
+        rows = [
+            self.location_row('3', '2'),
+            self.location_row('2', '1'),
+            self.location_row('1', ''),
+            self.location_row('4', 'missing'),
+            self.location_row('5', '6'),
+            self.location_row('6', '5'),
+        ]
+        result = import_locations(rows, batch_size=2)
+
+        self.assertEqual(result.imported_rows, 6)
+        self.assertEqual(result.unresolved_parents, 3)
+        self.assertEqual(Location.objects.get(id='3').parent_id_id, '2')
+        self.assertEqual(Location.objects.get(id='2').parent_id_id, '1')
+        self.assertIsNone(Location.objects.get(id='1').parent_id_id)
+        self.assertIsNone(Location.objects.get(id='4').parent_id_id)
+        self.assertIsNone(Location.objects.get(id='5').parent_id_id)
+        self.assertIsNone(Location.objects.get(id='6').parent_id_id)
+        self.assertEqual(Location.objects.get(id='3').path, '/1/2/3/')
+        self.assertEqual(Location.objects.get(id='3').depth, 2)
+
+    def test_import_swaps_slugs_in_one_batch(self):
+        import_locations([dict(self.location_row('1', ''), title='Alpha'), dict(self.location_row('2', ''), title='Beta')])
+        result = import_locations([dict(self.location_row('1', ''), title='Beta'), dict(self.location_row('2', ''), title='Alpha')])
+        self.assertEqual(result.skipped_rows, 0)
+        self.assertEqual(Location.objects.get(id='1').slug, 'beta')
+        self.assertEqual(Location.objects.get(id='2').slug, 'alpha')
+
+    def test_import_rebuilds_only_touched_subtrees(self):
+        import_locations([self.location_row('1', ''), self.location_row('2', '1'), self.location_row('3', '2'),
+                          self.location_row('7', '')])
+        # A stale path outside the imported subtree is left for a full rebuild
+        Location.objects.filter(id='1').update(path='/stale/')
+
+        import_locations([self.location_row('2', '7')])
+        self.assertEqual(Location.objects.get(id='3').path, '/7/2/3/')
+        self.assertEqual(Location.objects.get(id='3').depth, 2)
+        self.assertEqual(Location.objects.get(id='1').path, '/stale/')
+
+
+class FeedPartitionTestCase(TestCase):
+    def setUp(self):
+        location = Location.objects.create(
+            id='1', title='Feed City', center=Point(0, 0), location_type='city',
+            country_code='US', state_abbr='CA', city='Feed City',
+        )
+        for pk in ('301', '302'):
+            Accommodation.objects.create(
+                id=pk, feed=3, title=f'Feed Accommodation {pk}', country_code='US', bedroom_count=1,
+                usd_rate=100, center=Point(0, 0), images={}, location_id=location, amenities={},
+            )
+        with patch('polls.language.detect', return_value='en'):
+            LocalizeAccommodation.objects.create(
+                property_id_id='302', language='en', description='A quiet room.', policy={'pets': 'No pets'})
+
+    def test_swap_in_reloaded_feed(self):
+        # Rows of a feed without a partition move out of the default partition
+        self.assertTrue(create_partition(3))
+        self.assertIn(partition_name(3), [table for table, _, _ in list_partitions()])
+        self.assertEqual(Accommodation.objects.filter(feed=3).count(), 2)
+
+        staging = create_staging(3)
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {staging} SELECT * FROM polls_accommodation WHERE id = '301'")
+            cursor.execute(f"UPDATE {staging} SET title = 'Reloaded'")
+        with self.captureOnCommitCallbacks(execute=True):
+            swap_partition(3, staging)
+
+        self.assertEqual(list(Accommodation.objects.filter(feed=3).values_list('id', 'title')), [('301', 'Reloaded')])
+        # Localizations of accommodations dropped from the feed go with them
+        self.assertFalse(LocalizeAccommodation.objects.filter(property_id_id='302').exists())
+
+    def test_partitions_keep_spatial_index(self):
+        staging = create_staging(3)
+        with connection.cursor() as cursor:
+            for table in ('polls_accommodation', staging):
+                cursor.execute(
+                    "SELECT count(*) FROM pg_indexes WHERE tablename = %s AND indexdef ILIKE %s",
+                    [table, '%USING gist (center)%'],
+                )
+                self.assertEqual(cursor.fetchone()[0], 1, table)
+
+
+class AccommodationIngestTestCase(TestCase):
+    def setUp(self):
+        Location.objects.create(
+            id='1', title='Ingest City', center=Point(0, 0), location_type='city',
+            country_code='US', state_abbr='CA', city='Ingest City',
+        )
+        self.rows = [
+            {'id': '401', 'feed': 4, 'title': 'Loft', 'country_code': 'us', 'bedroom_count': 1, 'usd_rate': '90.00',
+             'center': [-122.4, 37.7], 'images': [], 'amenities': {'wifi': True}, 'location_id': '1', 'published': True},
+            {'id': '402', 'feed': 4, 'title': 'Cabin', 'country_code': 'US', 'bedroom_count': 2, 'usd_rate': '150',
+             'center': 'POINT(-122.5 37.8)', 'images': [], 'amenities': {}, 'location_id': '1'},
+            {'id': '403', 'feed': 4, 'title': 'Lost', 'country_code': 'US', 'bedroom_count': 1, 'usd_rate': '80',
+             'center': [0, 0], 'images': [], 'amenities': {}, 'location_id': 'missing'},
+            {'id': '404', 'feed': 4, 'title': 'Broken', 'country_code': 'US', 'bedroom_count': -1, 'usd_rate': '80',
+             'center': [0, 0], 'images': [], 'amenities': {}, 'location_id': '1'},
+        ]
+
+    def test_ingest_inserts_updates_and_skips_unchanged(self):
+        lines = [json.dumps(row) + '\n' for row in self.rows] + ['{not json}\n']
+        with self.captureOnCommitCallbacks(execute=True):
+            result = ingest_accommodations(read_feed(lines, 'ndjson'), batch_size=2)
+        self.assertEqual((result.total_rows, result.inserted, result.updated, result.skipped_rows), (5, 2, 0, 3))
+        self.assertEqual([row for row, _ in result.errors], [4, 5, 3])
+        loft = Accommodation.objects.get(pk='401')
+        self.assertEqual((loft.country_code, loft.center.x, loft.published), ('US', -122.4, True))
+        self.assertTrue(Accommodation.objects.filter(search_vector='loft').exists())
+
+        self.rows[1]['usd_rate'] = '175'
+        result = ingest_accommodations(self.rows[:2] + [dict(self.rows[1], usd_rate='250')])
+        self.assertEqual((result.inserted, result.updated, result.unchanged, result.duplicates), (0, 1, 1, 1))
+        self.assertEqual(Accommodation.objects.get(pk='402').usd_rate, 250)
+        self.assertEqual(facet_counts()['price_bands'], [{'band': '50-100', 'count': 1}, {'band': '200-500', 'count': 1}])
+
+    def test_ingest_rejects_ids_of_another_feed(self):
+        ingest_accommodations(self.rows[:1])
+        moved = dict(self.rows[0], feed=5)
+        mixed = [dict(self.rows[1], feed=5), self.rows[1]]
+        result = ingest_accommodations([moved] + mixed)
+        self.assertEqual((result.inserted, result.updated, result.skipped_rows), (0, 0, 3))
+        self.assertEqual(result.errors[0], (1, "Accommodation '401' already belongs to another feed."))
+        self.assertEqual(list(Accommodation.objects.values_list('id', 'feed')), [('401', 4)])
+
+    def test_ingest_command_reads_csv(self):
+        path = os.path.join(tempfile.mkdtemp(), 'feed.csv')
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['id', 'title', 'country_code', 'bedroom_count', 'usd_rate',
+                                                   'lon', 'lat', 'images', 'amenities', 'location_id', 'published'])
+            writer.writeheader()
+            writer.writerow({'id': '405', 'title': 'Flat', 'country_code': 'US', 'bedroom_count': 1, 'usd_rate': '60',
+                             'lon': '1.5', 'lat': '2.5', 'images': '[]', 'amenities': '{}', 'location_id': '1',
+                             'published': 'yes'})
+        out = io.StringIO()
+        call_command('ingest_accommodations', path, '--feed', '5', stdout=out)
+        self.assertIn('1 inserted', out.getvalue())
+        self.assertEqual(Accommodation.objects.get(pk='405').feed, 5)
+
+
+class SitemapTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for pk, title, country_code in [('1', 'San Francisco', 'US'), ('2', 'Austin', 'US'), ('3', 'Toronto', 'CA')]:
+            Location.objects.create(
+                id=pk, title=title, center=Point(0, 0), location_type='city',
+                country_code=country_code, state_abbr='XX', city=title,
+            )
+
+    def generate(self, *args):
+        output = io.StringIO()
+        path = os.path.join(self.directory, 'sitemap.json')
+        call_command(
+            'generate_sitemap', *args, output=path, stdout=output,
+            fragments_dir=os.path.join(self.directory, 'fragments'),
+            state_file=os.path.join(self.directory, 'state.json'),
+        )
+        with open(path) as f:
+            return json.load(f), output.getvalue()
+
+    def test_streamed_sitemap(self):
+        sitemap, _ = self.generate('--stream')
+        self.assertEqual(sitemap, [
+            {'country': 'CA', 'name': 'CA', 'locations': [{'Toronto': 'ca/toronto'}]},
+            {'country': 'US', 'name': 'US', 'locations': [{'Austin': 'us/austin'}, {'San Francisco': 'us/san-francisco'}]},
+        ])
+
+    def test_incremental_sitemap_regenerates_changed_countries(self):
+        streamed, _ = self.generate('--stream')
+        sitemap, output = self.generate('--incremental')
+        self.assertEqual(sitemap, streamed)
+        self.assertIn('2 countries regenerated', output)
+
+        Location.objects.filter(pk='3').delete()
+        austin = Location.objects.get(pk='2')
+        austin.title = 'Boston'
+        austin.save()
+        sitemap, output = self.generate('--incremental')
+        self.assertIn('1 countries regenerated, 1 removed', output)
+        self.assertEqual(sitemap, [
+            {'country': 'US', 'name': 'US', 'locations': [{'Boston': 'us/boston'}, {'San Francisco': 'us/san-francisco'}]},
+        ])
+
+
+    def test_xml_sitemap_shards_and_index(self):
+        xml_dir = os.path.join(self.directory, 'sitemaps')
+        self.generate('--xml', '--xml-dir', xml_dir, '--base-url', 'https://example.com',
+                      '--urls-per-shard', '1', '--workers', '1')
+        self.assertEqual(
+            sorted(os.listdir(xml_dir)),
+            ['sitemap-ca-1.xml.gz', 'sitemap-us-1.xml.gz', 'sitemap-us-2.xml.gz', 'sitemap.xml'],
+        )
+        with open(os.path.join(xml_dir, 'sitemap.xml')) as f:
+            index = f.read()
+        self.assertIn('<loc>https://example.com/sitemaps/sitemap-us-2.xml.gz</loc>', index)
+        with gzip.open(os.path.join(xml_dir, 'sitemap-us-2.xml.gz'), 'rt') as f:
+            shard = f.read()
+        # Location URLs resolve to the slug route
+        url = reverse('location_by_slug', args=['us', 'san-francisco'])
+        self.assertIn(f'<loc>https://example.com{url}</loc><lastmod>', shard)
+
+        # Shards left over from a larger run are removed
+        Location.objects.filter(pk='2').delete()
+        self.generate('--xml', '--xml-dir', xml_dir, '--urls-per-shard', '1', '--workers', '1')
+        self.assertNotIn('sitemap-us-2.xml.gz', os.listdir(xml_dir))
 
 
 class ViewsTestCase(TestCase):
     def setUp(self):
+        # Responses are cached across tests otherwise, since rolled back saves never commit
+        cache.clear()
         self.client = Client()
         self.user = User.objects.create_user(username='testuser', password='testpassword')
 
@@ -322,6 +685,320 @@ class ViewsTestCase(TestCase):
         self.assertEqual(len(response.json()['children']), 0)
 
 
+    @patch('polls.views.PAGE_SIZE', 2)
+    def test_location_list_cursor_pagination(self):
+        # Cursor mode walks forwards and backwards without OFFSET
+        response = self.client.get(reverse('location_list') + '?cursor=&count=exact')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([loc['id'] for loc in data['locations']], ['123', '456'])
+        self.assertEqual(data['count'], 3)
+        self.assertIsNone(data['prev'])
+
+        response = self.client.get(reverse('location_list'), {'cursor': data['next']})
+        data = response.json()
+        self.assertEqual([loc['id'] for loc in data['locations']], ['789'])
+        self.assertIsNone(data['next'])
+
+        response = self.client.get(reverse('location_list'), {'cursor': data['prev']})
+        data = response.json()
+        self.assertEqual([loc['id'] for loc in data['locations']], ['123', '456'])
+        self.assertIsNone(data['prev'])
+
+        response = self.client.get(reverse('location_list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_accommodation_list_search_filters(self):
+        # Range filters, location filter and sort order
+        response = self.client.get(reverse('accommodation_list'), {'min_bedrooms': 3})
+        self.assertEqual([a['id'] for a in response.json()['accommodations']], ['112'])
+
+        response = self.client.get(reverse('accommodation_list'), {'max_price': '160', 'min_score': '4'})
+        self.assertEqual([a['id'] for a in response.json()['accommodations']], ['111'])
+
+        response = self.client.get(reverse('accommodation_list'), {'location': '456'})
+        self.assertEqual([a['id'] for a in response.json()['accommodations']], ['112'])
+
+        response = self.client.get(reverse('accommodation_list'), {'sort': '-price'})
+        self.assertEqual([a['id'] for a in response.json()['accommodations']], ['112', '111'])
+
+        response = self.client.get(reverse('accommodation_list'), {'sort': '-price', 'cursor': ''})
+        self.assertEqual([a['id'] for a in response.json()['accommodations']], ['112', '111'])
+
+        # A cursor whose values do not fit the sort fields is rejected
+        tampered = encode_cursor('next', ['abc', '1'])
+        response = self.client.get(reverse('accommodation_list'), {'sort': 'price', 'cursor': tampered})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(reverse('accommodation_list'), {'sort': 'title'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('accommodation_list'), {'min_price': 'cheap'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_accommodation_facets_view(self):
+        # Facet counts follow saves and deletes through signals
+        response = self.client.get(reverse('accommodation_facets'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['countries'], [{'country_code': 'CA', 'count': 1}, {'country_code': 'US', 'count': 1}])
+
+        response = self.client.get(reverse('accommodation_facets'), {'published': 1, 'country': 'US'})
+        data = response.json()
+        self.assertEqual(data['countries'], [{'country_code': 'US', 'count': 1}])
+        self.assertEqual(data['bedrooms'], [{'bucket': '2', 'count': 1}])
+        self.assertEqual(data['price_bands'], [{'band': '100-200', 'count': 1}])
+
+        self.accommodation1.usd_rate = 600
+        self.accommodation1.save()
+        response = self.client.get(reverse('accommodation_facets'), {'country': 'US'})
+        self.assertEqual(response.json()['price_bands'], [{'band': '500+', 'count': 1}])
+
+        self.accommodation1.delete()
+        response = self.client.get(reverse('accommodation_facets'))
+        self.assertEqual(response.json()['countries'], [{'country_code': 'CA', 'count': 1}])
+
+    @patch('polls.language.detect', return_value='en')
+    def test_accommodation_search_view(self, mock_detect):
+        # Titles and stemmed descriptions are both searched through stored vectors
+        LocalizeAccommodation.objects.create(
+            property_id=self.accommodation2,
+            language='en',
+            description='Bright apartments overlooking the harbour',
+            policy={'pets': 'No pets allowed'},
+        )
+        response = self.client.get(reverse('accommodation_search'), {'q': 'apartment'})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([r['id'] for r in results], ['112'])
+        self.assertEqual(results[0]['language'], 'en')
+        self.assertIn('<b>apartments</b>', results[0]['headline'])
+
+        response = self.client.get(reverse('accommodation_search'), {'q': 'accommodation', 'published': 1})
+        self.assertEqual([r['id'] for r in response.json()['results']], ['111'])
+
+        response = self.client.get(reverse('accommodation_search'), {'q': 'apartment', 'language': 'fr'})
+        self.assertEqual(response.json()['results'], [])
+        response = self.client.get(reverse('accommodation_search'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_accommodation_export_view(self):
+        # Streams every matching row with its JSON columns, as NDJSON or CSV
+        response = self.client.get(reverse('accommodation_export'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([r['id'] for r in rows], ['111', '112'])
+        self.assertEqual(rows[0]['images'], {'image1': 'https://example.com/image1.jpg'})
+        self.assertEqual(rows[0]['center'], [12.0, 22.0])
+
+        response = self.client.get(reverse('accommodation_export'), {'format': 'csv', 'country': 'CA'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([r['id'] for r in rows], ['112'])
+        self.assertEqual(json.loads(rows[0]['amenities']), {'wifi': True, 'pool': True})
+
+        response = self.client.get(reverse('accommodation_export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_accommodation_nearby_view(self):
+        # Nearest first, with distances in meters
+        response = self.client.get(reverse('accommodation_nearby'), {'lat': 22.0, 'lon': 12.0})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['accommodations']
+        self.assertEqual([a['id'] for a in results], ['111', '112'])
+        self.assertEqual(results[0]['distance_m'], 0)
+        self.assertGreater(results[1]['distance_m'], 100000)
+
+        # Radius and the list filters narrow the results
+        response = self.client.get(reverse('accommodation_nearby'), {'lat': 22.0, 'lon': 12.0, 'radius': 50000})
+        self.assertEqual([a['id'] for a in response.json()['accommodations']], ['111'])
+        response = self.client.get(reverse('accommodation_nearby'), {'lat': 22.0, 'lon': 12.0, 'country': 'CA'})
+        self.assertEqual([a['id'] for a in response.json()['accommodations']], ['112'])
+
+        # The search point is required
+        response = self.client.get(reverse('accommodation_nearby'), {'lat': 22.0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_accommodation_nearby_view_at_high_latitude(self):
+        # 0.5 degrees north is nearer in planar degrees, 0.7 degrees east is nearer on the sphere
+        for pk, center in [('121', Point(0.0, 60.5)), ('122', Point(0.7, 60.0))]:
+            Accommodation.objects.create(
+                id=pk, title=f'Northern {pk}', country_code='NO', bedroom_count=1, usd_rate=100,
+                center=center, images={}, location_id=self.location1, amenities={},
+            )
+        response = self.client.get(reverse('accommodation_nearby'), {'lat': 60.0, 'lon': 0.0, 'k': 1, 'country': 'NO'})
+        self.assertEqual([a['id'] for a in response.json()['accommodations']], ['122'])
+
+    def test_accommodation_clusters_view(self):
+        # Both points share a cell at zoom 0 and are split at a closer zoom
+        response = self.client.get(reverse('accommodation_clusters'), {'zoom': 0})
+        self.assertEqual(response.status_code, 200)
+        clusters = response.json()['clusters']
+        self.assertEqual(len(clusters), 1)
+        self.assertEqual(clusters[0]['count'], 2)
+        self.assertEqual(float(clusters[0]['min_usd_rate']), 150.0)
+        self.assertEqual(float(clusters[0]['avg_usd_rate']), 175.0)
+
+        response = self.client.get(reverse('accommodation_clusters'), {'zoom': 8, 'published': 1})
+        clusters = response.json()['clusters']
+        self.assertEqual(len(clusters), 1)
+        self.assertEqual(clusters[0]['id'], '111')
+
+        response = self.client.get(reverse('accommodation_clusters'), {'zoom': 8, 'bbox': '12.5,22.5,14,24'})
+        self.assertEqual([c['id'] for c in response.json()['clusters']], ['112'])
+
+        response = self.client.get(reverse('accommodation_clusters'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_vector_tile_view(self):
+        # A tile covering all points renders once and is then served from the cache
+        cache.clear()
+        url = reverse('vector_tile', args=[0, 0, 0])
+        response = self.client.get(url, {'published': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertGreater(len(response.content), 0)
+
+        # Only the generation tokens are read
+        with self.assertNumQueries(1):
+            cached = self.client.get(url, {'published': 1})
+        self.assertEqual(cached.content, response.content)
+
+        # Every accommodation filter is part of the cache key
+        filtered = self.client.get(url, {'published': 1, 'min_price': 100000})
+        self.assertNotEqual(filtered.content, response.content)
+
+        # An edit starts a new generation, so the tile is rendered again
+        self.accommodation1.published = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.accommodation1.save()
+        self.assertNotEqual(self.client.get(url, {'published': 1}).content, response.content)
+
+        response = self.client.get(reverse('vector_tile', args=[1, 2, 0]))
+        self.assertEqual(response.status_code, 400)
+
+    def test_location_autocomplete_view(self):
+        # Short terms match prefixes, longer terms match anywhere in the title
+        response = self.client.get(reverse('location_autocomplete'), {'q': 'te'})
+        self.assertEqual([r['id'] for r in response.json()['results']], ['123', '456'])
+        response = self.client.get(reverse('location_autocomplete'), {'q': 'ch'})
+        self.assertEqual([r['id'] for r in response.json()['results']], ['789'])
+        response = self.client.get(reverse('location_autocomplete'), {'q': 'location 1'})
+        self.assertEqual([r['id'] for r in response.json()['results']], ['789', '123'])
+        response = self.client.get(reverse('location_autocomplete'), {'q': 'location', 'type': 'state', 'limit': 5})
+        self.assertEqual([r['id'] for r in response.json()['results']], ['456'])
+        response = self.client.get(reverse('location_autocomplete'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_list_responses_cached_until_invalidated(self):
+        url = reverse('location_children', args=['123'])
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        # Saves invalidate after commit, only for the pages they affect
+        with self.captureOnCommitCallbacks(execute=True):
+            self.child_location.title = 'Renamed Child'
+            self.child_location.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['children'][0]['title'], 'Renamed Child')
+
+        us_url = reverse('accommodation_list') + '?country=US'
+        all_url = reverse('accommodation_list') + '?published=0'
+        self.client.get(us_url)
+        self.client.get(all_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.accommodation2.usd_rate = 210
+            self.accommodation2.save()
+        self.assertEqual(self.client.get(us_url)['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(all_url)['X-Cache'], 'MISS')
+
+        # An import invalidates once per batch, including the new parents' pages
+        with self.captureOnCommitCallbacks(execute=True):
+            import_locations([{
+                'id': '790', 'title': 'Child Location 2', 'center': 'POINT(10.6 20.6)',
+                'location_type': 'neighborhood', 'country_code': 'US', 'state_abbr': 'CA',
+                'city': 'San Francisco', 'parent_id': '123',
+            }])
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(sorted(c['id'] for c in response.json()['children']), ['789', '790'])
+
+    def test_list_conditional_responses(self):
+        url = reverse('location_list')
+        # Last-Modified is withheld during the second a generation starts in
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        CacheGeneration.objects.update(started_at=F('started_at') - timedelta(seconds=2))
+        response = self.client.get(url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        # Unchanged data answers 304 without a body
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(url, {'type': 'city'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # Generations live in the database, not in a process's response cache
+        cache.clear()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.location2.title = 'Renamed Location'
+            self.location2.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_location_by_slug_view(self):
+        # Duplicate titles within a country get the id appended to their slug
+        duplicate = Location.objects.create(
+            id='999', title='Test Location 1', center=Point(0, 0), location_type='city',
+            country_code='US', state_abbr='TX', city='Austin',
+        )
+        self.assertEqual(self.location1.slug, 'test-location-1')
+        self.assertEqual(duplicate.slug, 'test-location-1-999')
+        duplicate.save()
+        self.assertEqual(duplicate.slug, 'test-location-1-999')
+
+        response = self.client.get(reverse('location_by_slug', args=['us', 'test-location-1']))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['location']['id'], '123')
+        self.assertEqual([c['slug'] for c in data['children']], ['child-location-1'])
+        response = self.client.get(reverse('location_by_slug', args=['ca', 'test-location-1']))
+        self.assertEqual(response.status_code, 404)
+
+        import_locations([
+            {'id': '1000', 'title': 'Test Location 2', 'center': 'POINT(0 0)', 'location_type': 'city',
+             'country_code': 'US', 'state_abbr': 'NY', 'city': 'Albany'},
+        ])
+        self.assertEqual(Location.objects.get(pk='1000').slug, 'test-location-2-1000')
+        self.assertEqual(Location.objects.get(pk='456').slug, 'test-location-2')
+
+    def test_location_hierarchy_views(self):
+        # Subtree, breadcrumb and published rollup for the parent location
+        response = self.client.get(reverse('location_descendants', args=['123']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([loc['id'] for loc in response.json()['descendants']], ['789'])
+
+        response = self.client.get(reverse('location_descendants', args=['123']), {'type': 'city'})
+        self.assertEqual(response.json()['descendants'], [])
+
+        response = self.client.get(reverse('location_ancestors', args=['789']))
+        self.assertEqual([loc['id'] for loc in response.json()['ancestors']], ['123'])
+
+        response = self.client.get(reverse('location_rollup', args=['123']))
+        data = response.json()
+        self.assertEqual(data['total'], 1)
+        counts = {loc['id']: (loc['published_count'], loc['total']) for loc in data['locations']}
+        self.assertEqual(counts, {'123': (1, 1), '789': (0, 0)})
+
+        response = self.client.get(reverse('location_rollup', args=['123']), {'max_depth': 'x'})
+        self.assertEqual(response.status_code, 400)
+
     def test_accommodation_list_view(self):
         # Test the accommodation_list view
         response = self.client.get(reverse('accommodation_list'))
@@ -384,7 +1061,8 @@ class AdminTestSuite(TestCase):
         )
 
         # Mock language detection to always return 'en' for tests
-        with patch('polls.models.detect', return_value='en'):
+        clear_detection_cache()
+        with patch('polls.language.detect', return_value='en'):
             # Create a LocalizeAccommodation with mocked language detection
             self.localized_accommodation = LocalizeAccommodation.objects.create(
                 property_id=self.accommodation,
@@ -396,7 +1074,7 @@ class AdminTestSuite(TestCase):
         # Set up the client
         self.client = Client()
 
-    @patch('polls.models.detect', return_value='en')  # Mock detect() to always return 'en'
+    @patch('polls.language.detect', return_value='en')  # Mock detect() to always return 'en'
     def test_location_admin_csv_import(self, mock_detect):
         # Log in as superuser
         self.client.login(username='superadmin', password='superpassword')
@@ -432,4 +1110,80 @@ class AdminTestSuite(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTrue(Location.objects.filter(title='New Location').exists())
 
-    
\ No newline at end of file
+    def test_location_admin_csv_import_updates_and_skips(self):
+        # Existing rows are updated in place and invalid rows are skipped
+        self.client.login(username='superadmin', password='superpassword')
+
+        csv_content = io.StringIO()
+        csv_writer = csv.writer(csv_content)
+        csv_writer.writerow(['id', 'title', 'center', 'location_type', 'country_code', 'state_abbr', 'city'])
+        csv_writer.writerow(['123', 'Renamed Location', 'POINT(10.0 20.0)', 'city', 'US', 'CA', 'San Francisco'])
+        csv_writer.writerow(['790', 'Broken Location', 'POINT(30.0)', 'city', 'US', 'CA', 'San Jose'])
+        csv_writer.writerow(['791', 'Another Location', 'POINT(31.0 41.0)', 'city', 'US', 'CA', 'San Jose'])
+
+        csv_file = SimpleUploadedFile('locations.csv', csv_content.getvalue().encode('utf-8'), content_type='text/csv')
+        response = self.client.post(
+            reverse('admin:polls_location_import_csv'),
+            {'csv_file': csv_file},
+            follow=True
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Location.objects.get(id='123').title, 'Renamed Location')
+        self.assertFalse(Location.objects.filter(id='790').exists())
+        self.assertTrue(Location.objects.filter(id='791').exists())
+        messages = [str(m) for m in response.context['messages']]
+        self.assertIn('CSV import complete. 2 rows imported, 1 rows skipped.', messages)
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_location_admin_csv_import_in_background(self):
+        # Queued imports are processed by the worker and resume after committed rows
+        self.client.login(username='superadmin', password='superpassword')
+
+        csv_content = io.StringIO()
+        csv_writer = csv.writer(csv_content)
+        csv_writer.writerow(['id', 'title', 'center', 'location_type', 'country_code', 'state_abbr', 'city'])
+        csv_writer.writerow(['800', 'Already Imported', 'POINT(30.0 40.0)', 'city', 'US', 'CA', 'San Jose'])
+        csv_writer.writerow(['801', 'Queued Location', 'POINT(31.0 41.0)', 'city', 'US', 'CA', 'San Jose'])
+
+        csv_file = SimpleUploadedFile('locations.csv', csv_content.getvalue().encode('utf-8'), content_type='text/csv')
+        response = self.client.post(
+            reverse('admin:polls_location_import_csv'),
+            {'csv_file': csv_file, 'run_in_background': 'on'},
+            follow=True
+        )
+
+        self.assertEqual(response.status_code, 200)
+        job = LocationImportJob.objects.get()
+        self.assertEqual(job.status, LocationImportJob.STATUS_PENDING)
+        self.assertFalse(Location.objects.filter(id='801').exists())
+
+        # Pretend a previous worker committed the first row before dying
+        job.processed_rows = 1
+        run_import_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, LocationImportJob.STATUS_COMPLETED)
+        self.assertEqual(job.processed_rows, 2)
+        self.assertFalse(Location.objects.filter(id='800').exists())
+        self.assertTrue(Location.objects.filter(id='801').exists())
+
+        response = self.client.get(reverse('admin:polls_locationimportjob_status', args=[job.pk]))
+        self.assertEqual(response.json()['status'], 'completed')
+
+        # Staff without view permission on jobs cannot read their errors
+        self.regular_user.is_staff = True
+        self.regular_user.save()
+        self.client.login(username='regularuser', password='regularpassword')
+        response = self.client.get(reverse('admin:polls_locationimportjob_status', args=[job.pk]))
+        self.assertEqual(response.status_code, 403)
+
+    def test_accommodation_admin_autocomplete(self):
+        # The property selector searches titles through the trigram index
+        self.client.login(username='superadmin', password='superpassword')
+        params = {'app_label': 'polls', 'model_name': 'localizeaccommodation', 'field_name': 'property_id'}
+        response = self.client.get(reverse('admin:autocomplete'), {**params, 'term': 'accomm'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['id'] for r in response.json()['results']], ['456'])
+        response = self.client.get(reverse('admin:autocomplete'), {**params, 'term': 'ac'})
+        self.assertEqual(response.json()['results'], [])
@@ -0,0 +1,74 @@
+import math
+from django.contrib.gis.geos import Polygon
+from django.db import connection
+
+# Tile extent and buffer in MVT integer coordinates
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+MAX_ZOOM = 22
+
+TILE_LAYERS = ('accommodations', 'locations')
+
+
+def tile_bounds(z, x, y):
+    """
+    Return the (west, south, east, north) WGS84 bounds of a web-mercator tile.
+    """
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return (x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y))
+
+
+def layer_sql(name, queryset, properties):
+    """
+    Wrap a values() queryset in SQL producing one MVT layer for the tile in %(bounds)s.
+    """
+    sql, params = queryset.query.sql_with_params()
+    columns = ', '.join(f'{expression} AS {alias}' for alias, expression in properties)
+    return f"""
+        (SELECT COALESCE(ST_AsMVT(layer, '{name}', {TILE_EXTENT}, 'geom'), ''::bytea) FROM (
+            SELECT {columns},
+                ST_AsMVTGeom(ST_Transform(rows.center, 3857), bounds.geom, {TILE_EXTENT}, {TILE_BUFFER}, true) AS geom
+            FROM ({sql}) AS rows, bounds
+        ) AS layer)""", params
+
+
+def render_tile(z, x, y, accommodations=None, locations=None):
+    """
+    Render the given querysets as layers of one Mapbox Vector Tile with ST_AsMVT.
+
+    Pass None to leave a layer out. Returns the tile as bytes.
+    """
+    bbox = Polygon.from_bbox(tile_bounds(z, x, y))
+    bbox.srid = 4326
+
+    layers = []
+    params = [z, x, y]
+    if accommodations is not None:
+        accommodations = accommodations.filter(center__intersects=bbox).values(
+            'id', 'title', 'bedroom_count', 'usd_rate', 'published', 'center')
+        sql, layer_params = layer_sql('accommodations', accommodations, [
+            ('id', 'rows.id'), ('title', 'rows.title'), ('bedroom_count', 'rows.bedroom_count'),
+            ('usd_rate', 'rows.usd_rate::float8'), ('published', 'rows.published'),
+        ])
+        layers.append(sql)
+        params.extend(layer_params)
+    if locations is not None:
+        locations = locations.filter(center__intersects=bbox).values('id', 'title', 'location_type', 'center')
+        sql, layer_params = layer_sql('locations', locations, [
+            ('id', 'rows.id'), ('title', 'rows.title'), ('location_type', 'rows.location_type'),
+        ])
+        layers.append(sql)
+        params.extend(layer_params)
+
+    if not layers:
+        return b''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"WITH bounds AS (SELECT ST_TileEnvelope(%s, %s, %s) AS geom) SELECT {' || '.join(layers)}",
+            params
+        )
+        return bytes(cursor.fetchone()[0])
@@ -1,12 +1,24 @@
-from django.urls import path
+from django.urls import path, re_path
 from . import views
 
 urlpatterns = [
     path("", views.index, name="index"),
     path("locations/", views.location_list, name="location_list"),
+    path("locations/autocomplete/", views.location_autocomplete, name="location_autocomplete"),
     path("accommodations/", views.accommodation_list, name="accommodation_list"),
+    path("accommodations/export/", views.accommodation_export, name="accommodation_export"),
+    path("accommodations/facets/", views.accommodation_facets, name="accommodation_facets"),
+    path("accommodations/search/", views.accommodation_search, name="accommodation_search"),
+    path("accommodations/nearby/", views.accommodation_nearby, name="accommodation_nearby"),
+    path("accommodations/clusters/", views.accommodation_clusters, name="accommodation_clusters"),
+    path("tiles/<int:z>/<int:x>/<int:y>.mvt", views.vector_tile, name="vector_tile"),
     
     path("locations/<str:location_id>/children/", views.location_children, name="location_children"),
+    path("locations/<str:location_id>/descendants/", views.location_descendants, name="location_descendants"),
+    path("locations/<str:location_id>/ancestors/", views.location_ancestors, name="location_ancestors"),
+    path("locations/<str:location_id>/rollup/", views.location_rollup, name="location_rollup"),
+    # Sitemap URLs, under their own prefix so no slug can collide with a locations/<id>/ route
+    re_path(r"^places/(?P<country>[A-Za-z]{2})/(?P<slug>[-\w]+)/$", views.location_by_slug, name="location_by_slug"),
 
     #path('signup/', views.property_owner_signup, name='property_owner_signup'),
     path('signup/', views.property_owner_signup, name='signup'),  # This maps the /signup/ URL
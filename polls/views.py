@@ -1,8 +1,66 @@
-from django.http import JsonResponse,HttpResponse
+from django.http import JsonResponse,HttpResponse,StreamingHttpResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import urlencode
 from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, render
 from django.contrib.auth.models import User, Group
-from .models import Location, Accommodation
+from django.contrib.gis.db.models.functions import Distance, GeometryDistance, SnapToGrid
+from django.db.models import Avg, Count, FloatField, Func, Min, Q
+from django.contrib.gis.measure import D
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from .models import Location, Accommodation, LocalizeAccommodation
+from .caching import cache_response, conditional_response, current_generations, location_generations
+from .exports import EXPORT_FORMATS, export_lines
+from .facets import facet_counts
+from .filters import FILTER_PARAMS, accommodation_ordering, filter_accommodations
+from .geo import dwithin_wrapped, meters_to_degrees, parse_bbox, parse_lat_lon
+from .tiles import MAX_ZOOM, TILE_LAYERS, render_tile
+from .pagination import InvalidCursor, cursor_page, estimate_count
+from .search import AUTOCOMPLETE_LIMIT, DEFAULT_SEARCH_CONFIG, autocomplete, search_config, search_query
+
+PAGE_SIZE = 10
+
+# Fields returned by the location hierarchy endpoints
+LOCATION_TREE_FIELDS = ('id', 'title', 'location_type', 'country_code', 'city', 'parent_id', 'depth')
+LOCATION_DETAIL_FIELDS = LOCATION_TREE_FIELDS + ('slug', 'state_abbr', 'updated_at')
+
+# Limits for accommodation_nearby
+NEARBY_DEFAULT_K = 10
+NEARBY_MAX_K = 100
+NEARBY_MAX_RADIUS = 200000  # meters
+
+# Full-text search result limits
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+# Grid cells per tile width used by accommodation_clusters
+CLUSTER_CELLS_PER_TILE = 8
+
+# Query parameters that change the content of a vector tile
+TILE_PARAMS = (*FILTER_PARAMS, 'type', 'layers')
+
+
+def cursor_response(request, queryset, ordering, key):
+    """
+    Build a keyset-paginated JSON response for `?cursor=` requests.
+
+    Query parameters:
+    - `cursor`: Token from a previous `next`/`prev` (empty for the first page)
+    - `count`: `exact` or `estimate` to include a total (omitted by default)
+    """
+    try:
+        page = cursor_page(queryset, ordering, PAGE_SIZE, request.GET.get('cursor') or None)
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    data = {"next": page["next"], "prev": page["prev"], key: page["items"]}
+    count = request.GET.get('count')
+    if count == 'exact':
+        data["count"] = queryset.count()
+    elif count == 'estimate':
+        data["count"] = estimate_count(queryset)
+    return JsonResponse(data)
 
 def index(request):
     return JsonResponse({"message": "Welcome to the Property Management System"})
@@ -30,12 +88,18 @@ def property_owner_signup(request):
     # Render the signup page if the method is GET
     return render(request, 'signup.html')
 
+def location_list_generations(request):
+    return ['locations']
+
+@conditional_response(location_list_generations)
+@cache_response(location_list_generations)
 def location_list(request):
     """
     Retrieve a paginated list of locations.
     Query parameters:
     - `page`: Page number (default is 1)
     - `type`: Filter by location type (optional)
+    - `cursor`: Switch to keyset pagination ordered by id (optional, see `cursor_response`)
     """
     location_type = request.GET.get('type', None)
     locations = Location.objects.all().order_by('id')  
@@ -43,7 +107,11 @@ def location_list(request):
     if location_type:
         locations = locations.filter(location_type=location_type)
 
-    paginator = Paginator(locations.values('id', 'title', 'location_type', 'country_code', 'city'), 10)
+    locations = locations.values('id', 'title', 'location_type', 'country_code', 'city')
+    if 'cursor' in request.GET:
+        return cursor_response(request, locations, ['id'], "locations")
+
+    paginator = Paginator(locations, PAGE_SIZE)
     page_number = request.GET.get('page', 1)
     page = paginator.get_page(page_number)
 
@@ -53,6 +121,41 @@ def location_list(request):
         "locations": list(page)
     })
 
+def location_autocomplete(request):
+    """
+    Suggest locations whose title contains the typed text.
+
+    One or two characters match title prefixes; longer text matches anywhere
+    through the trigram index.
+    Query parameters:
+    - `q`: Typed text (required)
+    - `type`: Filter by location type (optional)
+    - `country`: Filter by country code (optional)
+    - `limit`: Maximum number of suggestions (default 20, at most 20)
+    """
+    term = request.GET.get('q', '').strip()
+    try:
+        if not term:
+            raise ValueError("`q` is required.")
+        limit = min(int(request.GET.get('limit', AUTOCOMPLETE_LIMIT)), AUTOCOMPLETE_LIMIT)
+        if limit < 1:
+            raise ValueError("`limit` must be positive.")
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    locations = Location.objects.all()
+    if request.GET.get('type'):
+        locations = locations.filter(location_type=request.GET['type'])
+    if request.GET.get('country'):
+        locations = locations.filter(country_code=request.GET['country'])
+    locations = autocomplete(locations, term, limit=limit).values('id', 'title', 'location_type', 'country_code', 'city')
+    return JsonResponse({"results": list(locations)})
+
+def location_children_generations(request, location_id):
+    return [f'location:{location_id}']
+
+@conditional_response(location_children_generations)
+@cache_response(location_children_generations)
 def location_children(request, location_id):
     """
     Retrieve child locations of a given location.
@@ -61,6 +164,113 @@ def location_children(request, location_id):
     children = parent_location.children.values('id', 'title', 'location_type', 'country_code', 'city')
     return JsonResponse({"parent": parent_location.title, "children": list(children)})
 
+def location_by_slug(request, country, slug):
+    """
+    Resolve a sitemap URL such as /places/us/san-francisco/ to its location and children.
+
+    The location is found with one lookup on the unique (country_code, slug) index.
+    """
+    location = Location.objects.filter(country_code=country.upper(), slug=slug).values(*LOCATION_DETAIL_FIELDS).first()
+    if location is None:
+        return JsonResponse({"error": "Location not found."}, status=404)
+    children = Location.objects.filter(parent_id=location['id']).order_by('title').values(
+        'id', 'title', 'location_type', 'slug')
+    return JsonResponse({"location": location, "children": list(children)})
+
+def parse_max_depth(request):
+    """
+    Read the optional `max_depth` query parameter (levels below a location).
+    """
+    max_depth = request.GET.get('max_depth', None)
+    if max_depth is None:
+        return None
+    if not max_depth.isdigit():
+        raise ValueError("`max_depth` must be a non-negative integer.")
+    return int(max_depth)
+
+def location_descendants(request, location_id):
+    """
+    Retrieve every location below a given location with one indexed path lookup.
+    Query parameters:
+    - `max_depth`: Only include locations up to this many levels below (optional)
+    - `type`: Filter by location type (optional)
+    """
+    location = get_object_or_404(Location, pk=location_id)
+    try:
+        descendants = location.get_descendants(max_depth=parse_max_depth(request))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    if request.GET.get('type'):
+        descendants = descendants.filter(location_type=request.GET['type'])
+    descendants = descendants.order_by('path').values(*LOCATION_TREE_FIELDS)
+    return JsonResponse({"location": location.title, "descendants": list(descendants)})
+
+def location_ancestors(request, location_id):
+    """
+    Retrieve the breadcrumb of a location, root first, with one primary key lookup.
+    Query parameters:
+    - `type`: Filter by location type (optional)
+    """
+    location = get_object_or_404(Location, pk=location_id)
+    ancestors = location.get_ancestors()
+    if request.GET.get('type'):
+        ancestors = ancestors.filter(location_type=request.GET['type'])
+    ancestors = ancestors.values(*LOCATION_TREE_FIELDS)
+    return JsonResponse({"location": location.title, "ancestors": list(ancestors)})
+
+def location_rollup(request, location_id):
+    """
+    Count published accommodations for a location and each of its descendants.
+
+    `published_count` counts accommodations attached directly to a location and
+    `total` also includes everything below it. Both come from one grouped query
+    over the subtree.
+    Query parameters:
+    - `max_depth`: Only list locations up to this many levels below (optional)
+    - `type`: Only list locations of this type (optional)
+    """
+    location = get_object_or_404(Location, pk=location_id)
+    try:
+        max_depth = parse_max_depth(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    location_type = request.GET.get('type')
+
+    # get_descendants() guards against an empty path, which would prefix-match every row
+    subtree = Location.objects.filter(pk=location.pk) | location.get_descendants()
+    rows = list(
+        subtree
+        .annotate(published_count=Count('accommodation', filter=Q(accommodation__published=True)))
+        .order_by('path')
+        .values(*LOCATION_TREE_FIELDS, 'path', 'published_count')
+    )
+
+    # Credit each location's own count to it and to its ancestors inside the subtree
+    totals = {row['id']: 0 for row in rows}
+    for row in rows:
+        below = row['path'][len(location.path):].strip('/')
+        for node in [location.id] + (below.split('/') if below else []):
+            totals[node] += row['published_count']
+
+    results = []
+    for row in rows:
+        if max_depth is not None and row['depth'] > location.depth + max_depth:
+            continue
+        if location_type and row['location_type'] != location_type:
+            continue
+        row.pop('path')
+        row['total'] = totals[row['id']]
+        results.append(row)
+
+    return JsonResponse({"location": location.title, "total": totals[location.id], "locations": results})
+
+def accommodation_list_generations(request):
+    # A country filter narrows the response to that country's changes
+    country_code = request.GET.get('country')
+    return [f'accommodations:{country_code}'] if country_code else ['accommodations']
+
+@conditional_response(accommodation_list_generations)
+@cache_response(accommodation_list_generations)
 def accommodation_list(request):
     """
     Retrieve a paginated list of accommodations.
@@ -68,19 +278,23 @@ def accommodation_list(request):
     - `page`: Page number (default is 1)
     - `published`: Filter by published status (optional)
     - `country`: Filter by country code (optional)
+    - `location`, `min_bedrooms`, `max_bedrooms`, `min_price`, `max_price`,
+      `min_score`, `max_score`: See `filter_accommodations` (optional)
+    - `sort`: `price`, `score` or `bedrooms`, prefixed with `-` for descending (default id)
+    - `cursor`: Switch to keyset pagination in `sort` order (optional, see `cursor_response`)
     """
-    published = request.GET.get('published', None)
-    country_code = request.GET.get('country', None)
-    accommodations = Accommodation.objects.all()
+    try:
+        accommodations = filter_accommodations(Accommodation.objects.all(), request.GET)
+        ordering = accommodation_ordering(request.GET)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
 
-    if published is not None:
-        accommodations = accommodations.filter(published=bool(int(published)))
+    accommodations = accommodations.values(
+        'id', 'title', 'country_code', 'bedroom_count', 'review_score', 'usd_rate', 'published')
+    if 'cursor' in request.GET:
+        return cursor_response(request, accommodations, ordering, "accommodations")
 
-    if country_code:
-        accommodations = accommodations.filter(country_code=country_code)
-
-    paginator = Paginator(accommodations.values(
-        'id', 'title', 'country_code', 'bedroom_count', 'usd_rate', 'published'), 10)
+    paginator = Paginator(accommodations.order_by(*ordering), PAGE_SIZE)
     page_number = request.GET.get('page', 1)
     page = paginator.get_page(page_number)
 
@@ -90,6 +304,270 @@ def accommodation_list(request):
         "accommodations": list(page)
     })
 
+def accommodation_export(request):
+    """
+    Stream every accommodation matching the list filters, including images and amenities.
+
+    Rows are read through a server-side cursor in id order and written as
+    they arrive, so memory use does not grow with the size of the export.
+    Query parameters:
+    - `format`: `ndjson` (default) or `csv`
+    - `published`, `country`, `location`, `min_bedrooms`, ...: Same filters as `accommodation_list` (optional)
+    """
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({"error": f"`format` must be one of: {', '.join(EXPORT_FORMATS)}."}, status=400)
+    try:
+        accommodations = filter_accommodations(Accommodation.objects.all(), request.GET)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    response = StreamingHttpResponse(
+        export_lines(accommodations.order_by('id'), export_format),
+        content_type=EXPORT_FORMATS[export_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="accommodations.{export_format}"'
+    return response
+
+def accommodation_facets(request):
+    """
+    Retrieve accommodation counts per country, bedroom bucket and price band
+    from the precomputed facet table.
+    Query parameters:
+    - `published`: Count only published (1) or unpublished (0) accommodations (optional)
+    - `country`: Restrict bedroom and price counts to a country code (optional)
+    """
+    published = request.GET.get('published', None)
+    try:
+        published = bool(int(published)) if published is not None else None
+    except ValueError:
+        return JsonResponse({"error": "`published` must be 0 or 1."}, status=400)
+    return JsonResponse(facet_counts(published=published, country_code=request.GET.get('country')))
+
+def accommodation_search(request):
+    """
+    Full-text search over accommodation titles and localized descriptions, best match first.
+
+    Both sides are matched against their stored, GIN-indexed search vectors and
+    ranked with ts_rank; an accommodation matching in several places keeps its
+    best rank.
+    Query parameters:
+    - `q`: Search text, in web search syntax ("quoted phrases", -excluded, or) (required)
+    - `language`: Only search descriptions in this language, stemmed for it (optional)
+    - `limit`: Maximum number of results (default 20, at most 100)
+    - `published`, `country`, ...: Same filters as `accommodation_list` (optional)
+    """
+    text = request.GET.get('q', '').strip()
+    language = request.GET.get('language') or None
+    try:
+        if not text:
+            raise ValueError("`q` is required.")
+        limit = min(int(request.GET.get('limit', SEARCH_DEFAULT_LIMIT)), SEARCH_MAX_LIMIT)
+        if limit < 1:
+            raise ValueError("`limit` must be positive.")
+        accommodations = filter_accommodations(Accommodation.objects.all(), request.GET)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    title_query = SearchQuery(text, search_type='websearch', config=DEFAULT_SEARCH_CONFIG)
+    title_matches = (
+        accommodations.filter(search_vector=title_query)
+        .annotate(rank=SearchRank('search_vector', title_query))
+        .order_by('-rank', 'id')
+        .values_list('id', 'rank')[:limit]
+    )
+
+    description_query = search_query(text, language)
+    localizations = LocalizeAccommodation.objects.filter(
+        property_id__in=accommodations.values('id'), search_vector=description_query)
+    if language:
+        localizations = localizations.filter(language=language)
+    description_matches = (
+        localizations.annotate(rank=SearchRank('search_vector', description_query))
+        .order_by('-rank', 'id')
+        .values_list('property_id', 'rank', 'language', 'id')[:limit]
+    )
+
+    # Both lists are ranked, so the overall top `limit` is within their union
+    best = {}
+    for accommodation_id, rank in title_matches:
+        best[accommodation_id] = (rank, None, None)
+    for accommodation_id, rank, match_language, localization_id in description_matches:
+        if accommodation_id not in best or rank > best[accommodation_id][0]:
+            best[accommodation_id] = (rank, match_language, localization_id)
+    ranked = sorted(best.items(), key=lambda item: (-item[1][0], item[0]))[:limit]
+
+    details = Accommodation.objects.in_bulk([accommodation_id for accommodation_id, _ in ranked])
+    # Highlight each matched description with its own language's configuration
+    by_language = {}
+    for _, (_, match_language, localization_id) in ranked:
+        if localization_id:
+            by_language.setdefault(match_language, []).append(localization_id)
+    headlines = {}
+    for match_language, ids in by_language.items():
+        headlines.update(
+            LocalizeAccommodation.objects.filter(pk__in=ids)
+            .annotate(headline=SearchHeadline(
+                'description', description_query, config=search_config(match_language), max_words=20, min_words=5))
+            .values_list('id', 'headline')
+        )
+
+    results = []
+    for accommodation_id, (rank, match_language, localization_id) in ranked:
+        accommodation = details[accommodation_id]
+        results.append({
+            "id": accommodation_id,
+            "title": accommodation.title,
+            "country_code": accommodation.country_code,
+            "usd_rate": accommodation.usd_rate,
+            "language": match_language,
+            "headline": headlines.get(localization_id),
+            "rank": rank,
+        })
+    return JsonResponse({"query": text, "results": results})
+
+def accommodation_nearby(request):
+    """
+    Retrieve the accommodations nearest to a point, closest first.
+    Query parameters:
+    - `lat`, `lon`: Search point in WGS84 degrees (required)
+    - `radius`: Only include accommodations within this many meters (optional)
+    - `k`: Maximum number of results (default 10, at most 100)
+    - `published`, `country`: Same filters as `accommodation_list` (optional)
+    """
+    try:
+        point = parse_lat_lon(request.GET)
+        k = min(int(request.GET.get('k', NEARBY_DEFAULT_K)), NEARBY_MAX_K)
+        radius = request.GET.get('radius', None)
+        radius = float(radius) if radius is not None else None
+        if k < 1 or (radius is not None and not 0 < radius <= NEARBY_MAX_RADIUS):
+            raise ValueError(f"`k` must be positive and `radius` within (0, {NEARBY_MAX_RADIUS}] meters.")
+        accommodations = filter_accommodations(Accommodation.objects.all(), request.GET)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    if radius is not None:
+        # Cheap GiST bounding-box prefilter in degrees, then the exact spherical distance
+        accommodations = accommodations.filter(
+            dwithin_wrapped('center', point, meters_to_degrees(radius, point.y)),
+            center__distance_lte=(point, D(m=radius)),
+        )
+
+    # `<->` ordering lets PostGIS walk the GiST index in distance order (KNN),
+    # but it compares planar degrees, which stretch east-west away from the
+    # equator, so its first k rows need not be the k nearest. The k nearest
+    # do lie within the largest spherical distance among those rows, though:
+    # fetch everything within that distance and rank it exactly.
+    fields = ('id', 'title', 'country_code', 'bedroom_count', 'usd_rate', 'published', 'center', 'distance')
+    with_distance = accommodations.annotate(distance=Distance('center', point))
+    accommodations = list(with_distance.order_by(GeometryDistance('center', point)).values(*fields)[:k])
+    if len(accommodations) == k:
+        reach = max(accommodation['distance'].m for accommodation in accommodations)
+        accommodations = with_distance.filter(
+            dwithin_wrapped('center', point, meters_to_degrees(reach, point.y)),
+            center__distance_lte=(point, D(m=reach)),
+        ).order_by('distance', 'id').values(*fields)[:k]
+    else:
+        accommodations = sorted(accommodations, key=lambda a: (a['distance'].m, a['id']))
+
+    results = []
+    for accommodation in accommodations:
+        center = accommodation.pop('center')
+        accommodation['lat'] = center.y
+        accommodation['lon'] = center.x
+        accommodation['distance_m'] = round(accommodation.pop('distance').m, 1)
+        results.append(accommodation)
+
+    return JsonResponse({"accommodations": results})
+
+def accommodation_clusters(request):
+    """
+    Group accommodations into grid clusters for a map zoom level.
+    Query parameters:
+    - `zoom`: Map zoom level, 0 to 22 (required)
+    - `bbox`: Visible area as west,south,east,north in degrees (optional, default the whole map)
+    - `published`, `country`: Same filters as `accommodation_list` (optional)
+    """
+    try:
+        zoom = int(request.GET['zoom'])
+        if not 0 <= zoom <= MAX_ZOOM:
+            raise ValueError(f"`zoom` must be between 0 and {MAX_ZOOM}.")
+        accommodations = filter_accommodations(Accommodation.objects.all(), request.GET)
+        if request.GET.get('bbox'):
+            accommodations = accommodations.filter(center__intersects=parse_bbox(request.GET['bbox']))
+    except KeyError:
+        return JsonResponse({"error": "`zoom` is required."}, status=400)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    # Snap every point to a grid sized to the zoom level and aggregate per cell
+    cell_size = 360 / 2 ** zoom / CLUSTER_CELLS_PER_TILE
+    clusters = accommodations.annotate(cell=SnapToGrid('center', cell_size)).values('cell').annotate(
+        count=Count('id'),
+        first_id=Min('id'),
+        min_usd_rate=Min('usd_rate'),
+        avg_usd_rate=Avg('usd_rate'),
+        lon=Avg(Func('center', function='ST_X', output_field=FloatField())),
+        lat=Avg(Func('center', function='ST_Y', output_field=FloatField())),
+    ).order_by()
+
+    results = []
+    for cluster in clusters:
+        result = {
+            "lat": cluster['lat'],
+            "lon": cluster['lon'],
+            "count": cluster['count'],
+            "min_usd_rate": cluster['min_usd_rate'],
+            "avg_usd_rate": round(cluster['avg_usd_rate'], 2),
+        }
+        if cluster['count'] == 1:
+            result["id"] = cluster['first_id']
+        results.append(result)
+
+    return JsonResponse({"zoom": zoom, "cell_size": cell_size, "clusters": results})
+
+def vector_tile(request, z, x, y):
+    """
+    Render accommodation and location centers in a web-mercator tile as a Mapbox Vector Tile.
+    Query parameters:
+    - `published`, `country`, `location`, `min_bedrooms`, `max_bedrooms`,
+      `min_price`, `max_price`, `min_score`, `max_score`: Same filters as `accommodation_list` (optional)
+    - `type`: Filter locations by location type, as in `location_list` (optional)
+    - `layers`: Comma-separated subset of `accommodations,locations` (default both)
+    """
+    if not (0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return JsonResponse({"error": "Tile coordinates out of range."}, status=400)
+
+    layers = request.GET.get('layers', ','.join(TILE_LAYERS)).split(',')
+    params = sorted((name, request.GET[name]) for name in TILE_PARAMS if name in request.GET)
+    # Like cache_response, key on the generations of the layers drawn so edits show up at once
+    generations = []
+    if 'accommodations' in layers:
+        generations += accommodation_list_generations(request)
+    if 'locations' in layers:
+        generations += location_generations()
+    tokens = ':'.join(current_generations(generations))
+    cache_key = f"tile:{z}:{x}:{y}:{urlencode(params)}:{tokens}"
+    tile = cache.get(cache_key)
+
+    if tile is None:
+        try:
+            accommodations = filter_accommodations(Accommodation.objects.all(), request.GET)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        locations = Location.objects.all()
+        if request.GET.get('type'):
+            locations = locations.filter(location_type=request.GET['type'])
+
+        tile = render_tile(
+            z, x, y,
+            accommodations=accommodations if 'accommodations' in layers else None,
+            locations=locations if 'locations' in layers else None,
+        )
+        cache.set(cache_key, tile, getattr(settings, 'TILE_CACHE_TIMEOUT', 3600))
+
+    return HttpResponse(tile, content_type="application/vnd.mapbox-vector-tile")
+
 def accommodation_by_user(request, user_id):
     """
     Retrieve accommodations created by a specific user.